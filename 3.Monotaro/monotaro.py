@@ -1,7 +1,7 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import openpyxl
-from openpyxl.utils import get_column_letter
+from openpyxl.utils import get_column_letter, column_index_from_string
 from openpyxl.styles import Font, PatternFill
 from openpyxl.worksheet.worksheet import Worksheet
 import requests
@@ -9,6 +9,458 @@ from bs4 import BeautifulSoup
 import re
 import threading
 import time
+import os
+import json
+import unicodedata
+import shutil
+import tempfile
+import zipfile
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape as xml_escape
+
+from openpyxl.cell import WriteOnlyCell
+
+# 新規Excelの書き出し: XlsxWriter があれば使い、なければ openpyxl の write_only モード
+# （環境変数 ORDER_EXCEL_WRITER=openpyxl / xlsxwriter で指定可）
+try:
+    import xlsxwriter
+    from xlsxwriter.exceptions import FileCreateError
+    XLSXWRITER_AVAILABLE = True
+except ImportError:
+    XLSXWRITER_AVAILABLE = False
+
+EXCEL_HEADERS = ['メーカー', '注文コード', '商品名', '品番/型番', '単価', '数量', '値段（税別）', 'URL', '税込み']
+TEXT_COLUMNS = (2, 4)  # 文字列として書く列（注文コード・型番）
+
+def display_width(value):
+    """セルの値の表示幅（全角文字は2、結合文字は0として数える）"""
+    if value is None:
+        return 0
+    text = str(value)
+    if text.isascii():
+        return len(text)
+    return sum(0 if unicodedata.combining(ch) else 2 if unicodedata.east_asian_width(ch) in ('F', 'W') else 1
+               for ch in text)
+
+def write_new_workbook(file_path, sheet_name, headers, rows, text_columns=TEXT_COLUMNS, max_width=50):
+    """ヘッダ＋rows の新規ブックを1行ずつ書き出す（列幅・文字列書式は列単位で先に決める）"""
+    widths = {}
+    for row in [headers] + rows:
+        for col, val in enumerate(row, start=1):
+            widths[col] = max(widths.get(col, 0), display_width(val))
+    rows = [[('' if v is None else str(v)) if col in text_columns else v for col, v in enumerate(row, start=1)]
+            for row in rows]
+
+    forced = (os.environ.get('ORDER_EXCEL_WRITER') or '').strip().lower()
+    if XLSXWRITER_AVAILABLE and forced != 'openpyxl':
+        wb = xlsxwriter.Workbook(file_path, {'constant_memory': True, 'strings_to_urls': False})
+        try:
+            ws = wb.add_worksheet(sheet_name)
+            text_fmt = wb.add_format({'num_format': '@'})
+            header_fmt = wb.add_format({'bold': True, 'bg_color': '#D3D3D3', 'pattern': 1})
+            for col, length in widths.items():
+                ws.set_column(col - 1, col - 1, min(length + 2, max_width), text_fmt if col in text_columns else None)
+            for c, title in enumerate(headers):
+                ws.write_string(0, c, title, header_fmt)
+            for r, row in enumerate(rows, start=1):
+                for col, val in enumerate(row, start=1):
+                    if col in text_columns:
+                        ws.write_string(r, col - 1, val, text_fmt)
+                    elif val is not None and val != '':
+                        ws.write(r, col - 1, val)
+        finally:
+            try:
+                wb.close()
+            except FileCreateError as e:
+                if e.args and isinstance(e.args[0], PermissionError):
+                    raise e.args[0]
+                raise
+        return
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    for col, length in widths.items():
+        dim = ws.column_dimensions[get_column_letter(col)]
+        dim.width = min(length + 2, max_width)
+        if col in text_columns:
+            dim.number_format = '@'
+    header = []
+    for title in headers:
+        cell = WriteOnlyCell(ws, value=title)
+        cell.font = Font(bold=True)
+        cell.fill = PatternFill(start_color='D3D3D3', end_color='D3D3D3', fill_type='solid')
+        header.append(cell)
+    ws.append(header)
+    for row in rows:
+        out = []
+        for col, val in enumerate(row, start=1):
+            if col in text_columns:
+                val = WriteOnlyCell(ws, value=val)
+                val.number_format = '@'
+            out.append(val)
+        ws.append(out)
+    wb.save(file_path)
+
+# ============ 既存Excelへの追記（ブックを読み込まず、zip内の対象シートのXMLに行を足す） ============
+# 他のシート等は展開して低めの圧縮レベルで詰め直し（zipfile の公開APIでは圧縮されたままコピーできない）、
+# 対象シートだけを読み流して </sheetData> の直前に行を差し込む。r 属性のない行は直前の行の次として数える。
+# 文字列はインライン文字列で書くので sharedStrings.xml は書き換えない
+
+_XL_NS_MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_XL_NS_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_XL_NS_PKG_REL = 'http://schemas.openxmlformats.org/package/2006/relationships'
+_XL_CHUNK = 1 << 20
+_XL_ROW_RE = re.compile(rb'<(?:\w+:)?row\b([^>]*)>')
+_XL_ROW_NUM_RE = re.compile(rb'\br="(\d+)"')
+_XL_SHEETDATA_RE = re.compile(rb'<(\w+:)?sheetData\b[^>]*?(/?)>')
+_XL_DIMENSION_RE = re.compile(rb'(<(?:\w+:)?dimension\b[^>]*?\bref=")([^"]*)(")')
+_XL_ILLEGAL_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_XL_COLS_RE = re.compile(rb'<(?:\w+:)?cols\b[^>]*?(?:/>|>(.*?)</(?:\w+:)?cols>)', re.S)
+_XL_COL_RE = re.compile(rb'<(?:\w+:)?col\b([^>]*?)/?>')
+_XL_ATTR_RE = re.compile(rb'([\w:]+)="([^"]*)"')
+
+class SheetNotFound(Exception):
+    pass
+
+def read_sheet_parts(zf):
+    """シート名 → zip内のパス をブック内の順に返す"""
+    targets = {}
+    for rel in ET.fromstring(zf.read('xl/_rels/workbook.xml.rels')).iter(f'{{{_XL_NS_PKG_REL}}}Relationship'):
+        target = rel.get('Target', '')
+        if target.startswith('/'):
+            target = target.lstrip('/')
+        else:
+            target = os.path.normpath(os.path.join('xl', target)).replace(os.sep, '/')
+        targets[rel.get('Id')] = target
+    parts = {}
+    for sheet in ET.fromstring(zf.read('xl/workbook.xml')).iter(f'{{{_XL_NS_MAIN}}}sheet'):
+        target = targets.get(sheet.get(f'{{{_XL_NS_REL}}}id'))
+        if target is not None:
+            parts[sheet.get('name')] = target
+    return parts
+
+class WorkbookInfo:
+    """
+    ブックの構成情報（workbook.xml とリレーションだけを読む。ブック全体は読み込まない）
+    最終行は必要になったシートだけ1回数え、append_rows に渡せば追記でも使い回す
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self._stamp = self._file_stamp()
+        with zipfile.ZipFile(path) as zf:
+            self.sheet_parts = read_sheet_parts(zf)
+        self._dimensions = {}
+    
+    @property
+    def sheet_names(self):
+        return list(self.sheet_parts)
+    
+    def is_current(self):
+        """読み込んだ後にファイルが変わっていないか"""
+        try:
+            return self._file_stamp() == self._stamp
+        except OSError:
+            return False
+    
+    def part(self, sheet_name):
+        if sheet_name not in self.sheet_parts:
+            raise SheetNotFound(sheet_name)
+        return self.sheet_parts[sheet_name]
+    
+    def dimensions(self, sheet_name):
+        """(最終行番号, 最大列番号)"""
+        if sheet_name not in self._dimensions:
+            part = self.part(sheet_name)
+            with zipfile.ZipFile(self.path) as zf:
+                if part not in zf.NameToInfo:
+                    raise SheetNotFound(sheet_name)
+                self._dimensions[sheet_name] = scan_sheet(zf, part)
+        return self._dimensions[sheet_name]
+    
+    def _appended(self, sheet_name, last_row, max_col):
+        self._dimensions[sheet_name] = (last_row, max_col)
+        self._stamp = self._file_stamp()
+    
+    def _file_stamp(self):
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size)
+
+def scan_sheet(zf, part):
+    """シートXMLを読み流して (最終行番号, dimension の最大列番号) を返す"""
+    last_row, row, max_col, tail = 0, 0, 0, b''
+    with zf.open(part) as f:
+        while True:
+            chunk = f.read(_XL_CHUNK)
+            if not chunk:
+                break
+            buf = tail + chunk
+            if not max_col:
+                m = _XL_DIMENSION_RE.search(buf)
+                if m:
+                    cm = re.match(r'([A-Z]+)\d+$', m.group(2).decode('ascii', 'ignore').split(':')[-1])
+                    if cm:
+                        max_col = column_index_from_string(cm.group(1))
+            pos = 0
+            for m in _XL_ROW_RE.finditer(buf):
+                r = _XL_ROW_NUM_RE.search(m.group(1))
+                row = int(r.group(1)) if r else row + 1  # r のない行は直前の行の次
+                last_row = max(last_row, row)
+                pos = m.end()
+            tail = buf[max(pos, len(buf) - 1024):]
+    return last_row, max_col
+
+def _ensure_text_style(styles):
+    """cellXfs に表示形式「@」(49) の書式を用意して (書き換えた styles.xml または None, 書式番号) を返す"""
+    m = re.search(rb'<((?:\w+:)?)cellXfs\b[^>]*>(.*?)</(?:\w+:)?cellXfs>', styles, re.S)
+    if m is None:
+        return None, 0
+    prefix, body = m.group(1), m.group(2)
+    xfs = re.findall(rb'<(?:\w+:)?xf\b[^>]*?(?:/>|>.*?</(?:\w+:)?xf>)', body, re.S)
+    for i, xf in enumerate(xfs):
+        if b'numFmtId="49"' in xf and all(re.search(rb'\b%s="0"' % a, xf) for a in (b'fontId', b'fillId', b'borderId')):
+            return None, i
+    new_xf = b'<%sxf numFmtId="49" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>' % prefix
+    open_tag = re.sub(rb'\bcount="\d+"', b'count="%d"' % (len(xfs) + 1), styles[m.start():m.start(2)])
+    return styles[:m.start()] + open_tag + body + new_xf + styles[m.end(2):], len(xfs)
+
+def _rows_xml(rows, first, text_columns, text_style, p):
+    out = []
+    for r, row in enumerate(rows, start=first):
+        cells = []
+        for col, v in enumerate(row, start=1):
+            ref = f'{get_column_letter(col)}{r}'
+            if v is None or v == '':
+                continue
+            if isinstance(v, (int, float)) and not isinstance(v, bool) and col not in text_columns:
+                cells.append(f'<{p}c r="{ref}"><{p}v>{v}</{p}v></{p}c>')
+                continue
+            style = f' s="{text_style}"' if col in text_columns and text_style else ''
+            text = xml_escape(_XL_ILLEGAL_RE.sub('', str(v)))
+            cells.append(f'<{p}c r="{ref}"{style} t="inlineStr"><{p}is><{p}t xml:space="preserve">{text}</{p}t></{p}is></{p}c>')
+        out.append(f'<{p}row r="{r}">{"".join(cells)}</{p}row>')
+    return ''.join(out).encode('utf-8')
+
+def _widen_columns(head, widths, p):
+    """<cols> の幅が widths に足りない列だけ広げる（既存の幅・手で広げた幅は狭めない）"""
+    m = _XL_COLS_RE.search(head)
+    cols = []  # [最小列, 最大列, 属性]
+    if m is not None and m.group(1):
+        for c in _XL_COL_RE.finditer(m.group(1)):
+            attrs = dict(_XL_ATTR_RE.findall(c.group(1)))
+            cols.append([int(attrs.pop(b'min')), int(attrs.pop(b'max')), attrs])
+    changed = False
+    for col, width in sorted(widths.items()):
+        hit = next((c for c in cols if c[0] <= col <= c[1]), None)
+        if hit is not None and float(hit[2].get(b'width') or 0) >= width:
+            continue
+        attrs = dict(hit[2]) if hit is not None else {}
+        attrs[b'width'] = ('%g' % width).encode('ascii')
+        attrs[b'customWidth'] = b'1'
+        if hit is not None:
+            # 範囲指定の列は、広げる列だけを切り出す
+            cols.remove(hit)
+            if hit[0] < col:
+                cols.append([hit[0], col - 1, hit[2]])
+            if col < hit[1]:
+                cols.append([col + 1, hit[1], hit[2]])
+        cols.append([col, col, attrs])
+        changed = True
+    if not changed:
+        return head
+    cols.sort(key=lambda c: c[0])
+    body = b''.join(b'<%scol min="%d" max="%d"%s/>' % (p, lo, hi, b''.join(b' %s="%s"' % kv for kv in attrs.items()))
+                    for lo, hi, attrs in cols)
+    xml = b'<%scols>%s</%scols>' % (p, body, p)
+    if m is not None:
+        return head[:m.start()] + xml + head[m.end():]
+    return head + xml  # <cols> は <sheetData> の直前に置く
+
+def _open_zip_member(zout, name, size):
+    # 名前で開くと、ブックの圧縮方式・圧縮レベルが使われる（4GBを超えそうなら最初から ZIP64 にする）
+    return zout.open(name, 'w', force_zip64=size > zipfile.ZIP64_LIMIT)
+
+def _write_sheet(zin, zout, info, last_row, max_col, rows, text_columns, text_style, widths):
+    """シートXMLを読み流しながら dimension と列幅を直し、</sheetData> の直前に行を差し込む"""
+    with zin.open(info) as src:
+        head, m = b'', None
+        while m is None:
+            chunk = src.read(_XL_CHUNK)
+            if not chunk:
+                raise ValueError(f'シートの形式が不正です: {info.filename}')
+            head += chunk
+            m = _XL_SHEETDATA_RE.search(head)
+        p = m.group(1) or b''
+        rows_xml = _rows_xml(rows, last_row + 1, text_columns, text_style, p.decode('ascii'))
+        ncols = max([max_col, 1] + [len(r) for r in rows])
+        dimension = f'A1:{get_column_letter(ncols)}{max(last_row + len(rows), 1)}'.encode('ascii')
+        before = _XL_DIMENSION_RE.sub(lambda d: d.group(1) + dimension + d.group(3), head[:m.start()])
+        with _open_zip_member(zout, info.filename, info.file_size + len(rows_xml)) as dst:
+            dst.write(_widen_columns(before, widths, p))
+            if m.group(2):
+                # 行が1つもない <sheetData/>
+                dst.write(b'<%ssheetData>' % p + rows_xml + b'</%ssheetData>' % p + head[m.end():])
+            else:
+                buf = head[m.start():]
+                close_re = re.compile(rb'</(?:\w+:)?sheetData>')
+                while True:
+                    c = close_re.search(buf)
+                    if c is not None:
+                        dst.write(buf[:c.start()] + rows_xml + buf[c.start():])
+                        break
+                    dst.write(buf[:-32])
+                    buf = buf[-32:]
+                    chunk = src.read(_XL_CHUNK)
+                    if not chunk:
+                        raise ValueError(f'シートの形式が不正です: {info.filename}')
+                    buf += chunk
+            shutil.copyfileobj(src, dst, _XL_CHUNK)
+
+def _copy_zip_member(zin, zout, info):
+    """メンバーを読み流しながらコピーする（zipfile の公開APIだけを使うので、展開して圧縮し直す）"""
+    with zin.open(info) as src, _open_zip_member(zout, info.filename, info.file_size) as dst:
+        shutil.copyfileobj(src, dst, _XL_CHUNK)
+
+def append_rows(path, sheet_name, rows, text_columns=TEXT_COLUMNS, max_width=50, info=None):
+    """
+    既存ブックのシート末尾に rows を追記して (最初の行番号, 最後の行番号) を返す
+    列幅はシートに入っている幅を前回までの最大とみなし、追加した行だけを測って足りない列だけ広げる
+    info に先に読んだ WorkbookInfo を渡すと、シート構成・最終行を読み直さずに使う（追記後の状態に更新される）
+    シートがなければ SheetNotFound、ファイルが開かれていれば PermissionError
+    """
+    if info is None or info.path != path or not info.is_current():
+        info = WorkbookInfo(path)
+    part = info.part(sheet_name)
+    last_row, max_col = info.dimensions(sheet_name)
+    with zipfile.ZipFile(path) as zin:
+        if part not in zin.NameToInfo:
+            raise SheetNotFound(sheet_name)
+        styles_xml, text_style = None, None
+        if text_columns and 'xl/styles.xml' in zin.NameToInfo:
+            styles_xml, text_style = _ensure_text_style(zin.read('xl/styles.xml'))
+        widths = {}
+        for row in rows:
+            for col, val in enumerate(row, start=1):
+                widths[col] = max(widths.get(col, 0), min(display_width(val) + 2, max_width))
+
+        fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(os.path.abspath(path)))
+        os.close(fd)
+        try:
+            with zipfile.ZipFile(tmp, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as zout:  # 速さを優先して低めの圧縮
+                for member in zin.infolist():
+                    if member.filename == part:
+                        _write_sheet(zin, zout, member, last_row, max_col, rows, text_columns, text_style, widths)
+                    elif member.filename == 'xl/styles.xml' and styles_xml is not None:
+                        zout.writestr(member.filename, styles_xml)
+                    else:
+                        _copy_zip_member(zin, zout, member)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    info._appended(sheet_name, last_row + len(rows), max(max_col, max((len(r) for r in rows), default=0)))
+    return last_row + 1, last_row + len(rows)
+
+def get_app_data_dir():
+    """一時保存ファイルなどの保存先（%LOCALAPPDATA%\\MonotaroOrder など）"""
+    base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache')
+    path = os.path.join(base, 'MonotaroOrder')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+class PreflightError(Exception):
+    """保存先に書き込めない（メッセージはそのまま画面に表示する）"""
+    pass
+
+_LOCKED_MESSAGE = 'ファイルが他のアプリケーションで開かれています。\nファイルを閉じてから実行してください:\n{path}'
+_INVALID_SHEET_CHARS = '[]:*?/\\'
+
+def check_output_file(path, sheet_name=None, append=True):
+    """
+    取得を始める前に保存先を確かめ、(ブックの構成情報, シート名) を返す（構成情報は追記でそのまま使う）
+    sheet_name が None なら既存ブックの先頭シート（なければ「注文内容」）
+    Excelで開かれている・ブックとして読めない・シートを作れない場合は PreflightError
+    """
+    folder, name = os.path.split(os.path.abspath(path))
+    # Excelが開いている間は所有者ファイル（~$ファイル名。長い名前では先頭2文字が置き換わる）がある
+    locks = ['~$' + name] + (['~$' + name[2:]] if len(os.path.splitext(name)[0]) > 6 else [])
+    for lock in locks:
+        if os.path.exists(os.path.join(folder, lock)):
+            raise PreflightError(_LOCKED_MESSAGE.format(path=path)
+                                 + f'\n\n（Excelを閉じても表示される場合は、同じフォルダの {lock} を削除してください）')
+
+    info, names = None, []
+    if os.path.exists(path):
+        try:
+            # Windows では Excel が開いているファイルは書き込みモードで開けない
+            with open(path, 'r+b'):
+                pass
+            if append:
+                info = WorkbookInfo(path)
+                names = info.sheet_names
+        except PermissionError:
+            raise PreflightError(_LOCKED_MESSAGE.format(path=path))
+        except OSError as e:
+            raise PreflightError(f'ファイルに書き込めません:\n{path}\n{e}')
+        except (zipfile.BadZipFile, KeyError, ET.ParseError, ValueError) as e:
+            raise PreflightError(f'Excelブック（.xlsx）として読み込めません:\n{path}\n{e}')
+    elif not os.path.isdir(folder):
+        raise PreflightError(f'保存先のフォルダがありません:\n{folder}')
+    elif not os.access(folder, os.W_OK):
+        raise PreflightError(f'保存先のフォルダに書き込めません:\n{folder}')
+
+    if sheet_name is None:
+        sheet_name = names[0] if names else '注文内容'
+    if sheet_name in names:
+        try:
+            info.dimensions(sheet_name)
+        except (SheetNotFound, OSError, zipfile.BadZipFile) as e:
+            raise PreflightError(f'シート「{sheet_name}」を読み込めません:\n{path}\n{e}')
+        return info, sheet_name
+    if len(sheet_name) > 31 or any(ch in sheet_name for ch in _INVALID_SHEET_CHARS) or sheet_name.strip("'") != sheet_name:
+        raise PreflightError(f'このシート名は使えません（31文字以内で [ ] : * ? / \\ を含まない名前にしてください）:\n{sheet_name}')
+    if sheet_name.lower() in (n.lower() for n in names):
+        raise PreflightError(f'大文字・小文字だけが違う同名のシートがあるため作成できません:\n{sheet_name}')
+    return info, sheet_name
+
+def save_spool(mode, path, sheet_name, data_list):
+    """
+    取得結果を一時保存してそのファイルのパスを返す
+    Excelへの保存に失敗しても取得し直さずにやり直せる（保存できたら remove_spool で消す）
+    """
+    folder = os.path.join(get_app_data_dir(), 'spool')
+    os.makedirs(folder, exist_ok=True)
+    fd, spool_path = tempfile.mkstemp(prefix=time.strftime('%Y%m%d-%H%M%S-'), suffix='.json', dir=folder)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump({'mode': mode, 'path': path, 'sheet_name': sheet_name, 'items': data_list,
+                   'created_at': time.time()}, f, ensure_ascii=False)
+    return spool_path
+
+def load_spool(spool_path):
+    """一時保存した取得結果（壊れていれば None）"""
+    try:
+        with open(spool_path, encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or not isinstance(data.get('items'), list):
+        return None
+    return data
+
+def remove_spool(spool_path):
+    if not spool_path:
+        return
+    try:
+        os.remove(spool_path)
+    except OSError:
+        pass
+
+def pending_spools():
+    """保存されずに残っている取得結果（古い順）"""
+    folder = os.path.join(get_app_data_dir(), 'spool')
+    if not os.path.isdir(folder):
+        return []
+    return [os.path.join(folder, n) for n in sorted(os.listdir(folder)) if n.endswith('.json')]
 
 class MonotaroExcelApp:
     def __init__(self, root):
@@ -32,6 +484,9 @@ class MonotaroExcelApp:
         
         self.create_widgets()
         
+        # 前回保存できなかった取得結果があれば保存し直す
+        self.root.after(500, self.restore_spools)
+        
     def create_widgets(self):
         # === モード選択フレーム ===
         mode_frame = ttk.LabelFrame(self.root, text='1. モード選択', padding=10)
@@ -319,7 +774,7 @@ class MonotaroExcelApp:
                         price_tax_excluded = numbers[0]
             
             # 税込価格: 販売価格(税込)を含むReferencePrice
-            ref_price_title = soup.find('span', class_='ReferencePrice__Title', text=re.compile(r'販売価格.*税込'))
+            ref_price_title = soup.find('span', class_='ReferencePrice__Title', string=re.compile(r'販売価格.*税込'))
             if ref_price_title and ref_price_title.parent:
                 parent_text = ref_price_title.parent.get_text(strip=True)
                 numbers = re.findall(r'[\d,]+', parent_text)
@@ -385,63 +840,40 @@ class MonotaroExcelApp:
             print(f'エラー: {str(e)}, URL: {url}')
             return None
     
-    def write_to_excel(self, file_path, sheet_name, data_list, append=True):
+    def write_to_excel(self, file_path, sheet_name, data_list, append=True, info=None):
         """Excelファイルにデータを書き込み"""
         try:
-            wb = None
-            ws: Worksheet = None  # 型ヒント追加
-            if append and sheet_name:
-                # 既存ファイルに追加
+            if not (append and sheet_name):
+                # 新規作成: ブック全体をメモリに持たずに1行ずつ書き出す
+                rows = [self._build_row(data) for data in data_list]
                 try:
-                    wb = openpyxl.load_workbook(file_path)
+                    write_new_workbook(file_path, sheet_name if sheet_name else '注文内容', EXCEL_HEADERS, rows)
                 except PermissionError:
                     raise PermissionError(f'ファイルが他のアプリケーションで開かれています。\nファイルを閉じてから実行してください:\n{file_path}')
-                if sheet_name in wb.sheetnames:
-                    ws = wb[sheet_name]
-                else:
-                    ws = wb.create_sheet(sheet_name)
-                start_row = ws.max_row + 1
-            else:
-                # 新規作成
-                wb = openpyxl.Workbook()
-                ws = wb.active
-                ws.title = sheet_name if sheet_name else '注文内容'
-                # ヘッダ行を作成
-                headers = ['メーカー', '注文コード', '商品名', '品番/型番', '単価', '数量', '値段（税別）', 'URL', '税込み']
-                ws.append(headers)
-                # ヘッダの書式設定
-                for cell in ws[1]:
-                    cell.font = Font(bold=True)
-                    cell.fill = PatternFill(start_color='D3D3D3', end_color='D3D3D3', fill_type='solid')
-                start_row = 2
+                return True
+            
+            # 既存ファイルに追加（シートがあればシートのXMLに行を足すだけで、ブック全体は読み込まない）
+            try:
+                append_rows(file_path, sheet_name, [self._build_row(data) for data in data_list], info=info)
+                return True
+            except PermissionError:
+                raise PermissionError(f'ファイルが他のアプリケーションで開かれています。\nファイルを閉じてから実行してください:\n{file_path}')
+            except SheetNotFound:
+                pass  # シートを新しく作るときだけブックを読み込む
+            
+            ws: Worksheet = None  # 型ヒント追加
+            try:
+                wb = openpyxl.load_workbook(file_path)
+            except PermissionError:
+                raise PermissionError(f'ファイルが他のアプリケーションで開かれています。\nファイルを閉じてから実行してください:\n{file_path}')
+            ws = wb.create_sheet(sheet_name)
+            start_row = ws.max_row + 1
             
             # データを書き込み
             for idx, data in enumerate(data_list):
-                price_tax_excluded = data.get('price_tax_excluded', '')
-                price_tax_included = data.get('price_tax_included', '')
-                quantity = data.get('quantity', '')
-                total_tax_excluded = ''
-                if price_tax_excluded and quantity:
-                    try:
-                        price_num = float(str(price_tax_excluded).replace(',', ''))
-                        qty_num = int(str(quantity))
-                        total_tax_excluded = str(int(price_num * qty_num))
-                    except:
-                        pass
                 item_code = data.get('item_code', '')
                 model_number = data.get('model_number', '')
-                row = [
-                    data.get('supplier', 'モノタロウ'),  # メーカー
-                    item_code,  # 注文コード
-                    data.get('product_name', ''),  # 商品名
-                    model_number,  # 品番/型番
-                    price_tax_excluded,  # 単価
-                    quantity,  # 数量
-                    total_tax_excluded,  # 値段（税別）
-                    data.get('url', ''),  # URL
-                    price_tax_included  # 税込み
-                ]
-                ws.append(row)
+                ws.append(self._build_row(data))
                 current_row = ws.max_row
                 # 商品コード（B列=2）
                 if item_code:
@@ -460,16 +892,10 @@ class MonotaroExcelApp:
                     except Exception:
                         pass
             
-            # 列の幅を自動調整
+            # 列の幅を自動調整（新しいシートなので追加した行だけを測る・全角文字は2文字分）
             for column in ws.columns:
-                max_length = 0
+                max_length = max(display_width(cell.value) for cell in column)
                 column_letter = get_column_letter(column[0].column)
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except Exception:
-                        pass
                 adjusted_width = min(max_length + 2, 50)
                 ws.column_dimensions[column_letter].width = adjusted_width
             
@@ -486,6 +912,108 @@ class MonotaroExcelApp:
             print(f'Excel書き込みエラー: {e}')
             return False
     
+    def _call_in_ui(self, func, *args):
+        """Tkのスレッドで func を実行して結果を返す（ワーカースレッドからダイアログを出すときに使う）"""
+        if threading.current_thread() is threading.main_thread():
+            return func(*args)
+        done = threading.Event()
+        result = []
+        
+        def run():
+            try:
+                result.append(func(*args))
+            finally:
+                done.set()
+        
+        self.root.after(0, run)
+        done.wait()
+        return result[0] if result else None
+    
+    def save_with_retry(self, mode, file_path, sheet_name, data_list, spool_path=None, info=None):
+        """
+        Excelに書き込み、失敗したら再試行するか確認する
+        保存できたら一時保存を消して True。やめた場合は一時保存を残す（次回起動時に保存し直せる）
+        """
+        while True:
+            try:
+                if self.write_to_excel(file_path, sheet_name, data_list, append=(mode != 'new'), info=info):
+                    break
+                error = f'Excelファイルの書き込みに失敗しました:\n{file_path}'
+            except PermissionError as pe:
+                error = str(pe)
+            info = None  # ファイルが変わっている可能性があるので読み直す
+            kept = '\n\n取得した結果は一時保存してあります。' if spool_path else ''
+            retry = self._call_in_ui(messagebox.askretrycancel, '保存エラー', f'{error}{kept}\n\n'
+                                     'ファイルを閉じるなどしてから「再試行」を押してください。')
+            if not retry:
+                if spool_path:
+                    self.root.after(0, lambda: messagebox.showinfo(
+                        '保存を中止しました', '取得した結果は次回起動時に保存し直せます:\n' + spool_path))
+                return False
+        
+        remove_spool(spool_path)
+        if mode == 'new':
+            self.root.after(0, lambda: messagebox.showinfo('完了', f'Excelファイルに{len(data_list)}件の商品を書き込みました'))
+        else:
+            self.root.after(0, lambda: messagebox.showinfo('完了', f'既存ファイルに{len(data_list)}件の商品を追加しました'))
+        return True
+    
+    def restore_spools(self):
+        """前回保存できなかった取得結果を保存し直す（破棄・保留も選べる）"""
+        for spool_path in pending_spools():
+            data = load_spool(spool_path)
+            if data is None:
+                print(f'一時保存ファイルを読めません: {spool_path}')
+                continue
+            
+            mode = 'new' if data.get('mode') == 'new' else 'append'
+            file_path = data.get('path', '')
+            sheet_name = data.get('sheet_name') or '注文内容'
+            data_list = data['items']
+            answer = messagebox.askyesnocancel(
+                '未保存の取得結果',
+                f'前回保存できなかった取得結果があります（{len(data_list)}件）。\n'
+                f'保存先: {file_path}\nシート: {sheet_name}（{"新規作成" if mode == "new" else "追記"}）\n\n'
+                '今すぐ保存しますか？\n「いいえ」で破棄、「キャンセル」で次回まで保留します。'
+            )
+            if answer is None:
+                continue
+            if not answer:
+                remove_spool(spool_path)
+                continue
+            
+            try:
+                info, sheet_name = check_output_file(file_path, sheet_name, append=(mode != 'new'))
+            except PreflightError as pe:
+                messagebox.showerror('エラー', f'{pe}\n\n取得結果は次回起動時まで保留します。')
+                continue
+            self.save_with_retry(mode, file_path, sheet_name, data_list, spool_path, info)
+    
+    def _build_row(self, data):
+        """1商品分の行データを作成"""
+        price_tax_excluded = data.get('price_tax_excluded', '')
+        price_tax_included = data.get('price_tax_included', '')
+        quantity = data.get('quantity', '')
+        total_tax_excluded = ''
+        if price_tax_excluded and quantity:
+            try:
+                price_num = float(str(price_tax_excluded).replace(',', ''))
+                qty_num = int(str(quantity))
+                total_tax_excluded = str(int(price_num * qty_num))
+            except:
+                pass
+        return [
+            data.get('supplier', 'モノタロウ'),  # メーカー
+            data.get('item_code', ''),  # 注文コード
+            data.get('product_name', ''),  # 商品名
+            data.get('model_number', ''),  # 品番/型番
+            price_tax_excluded,  # 単価
+            quantity,  # 数量
+            total_tax_excluded,  # 値段（税別）
+            data.get('url', ''),  # URL
+            price_tax_included  # 税込み
+        ]
+    
     def run_conversion(self):
         """変換を実行"""
         items = self.listbox.get(0, tk.END)
@@ -493,16 +1021,46 @@ class MonotaroExcelApp:
             messagebox.showwarning('警告', 'URLリストに商品を追加してください')
             return
         
+        # 取得を始める前に保存先に書き込めるかを確かめる
+        target = self.check_output()
+        if target is None:
+            return
+        
         self.btn_run.config(state='disabled')
         self.status_var.set('処理中...')
         self.root.update()
         
         # スレッドで実行（UIをブロックしない）
-        thread = threading.Thread(target=self._process_conversion, args=(items,))
+        thread = threading.Thread(target=self._process_conversion, args=(items, target))
         thread.daemon = True
         thread.start()
     
-    def _process_conversion(self, items):
+    def check_output(self):
+        """保存先の事前チェック。書き込めれば (モード, パス, シート名, ブックの構成情報)、書き込めなければ None"""
+        mode = self.mode_var.get()
+        if mode == 'new':
+            file_path = self.entry_file_path.get().strip()
+            sheet_name = self.entry_sheet_name.get().strip() or '注文内容'
+            if not file_path:
+                messagebox.showwarning('警告', '新規ファイルパスを入力してください')
+                return None
+        else:
+            file_path = self.entry_existing_file.get().strip()
+            sheet_name = None  # 先頭シートに追記する
+            if not file_path:
+                messagebox.showwarning('警告', '既存ファイルパスを入力してください')
+                return None
+            if not os.path.exists(file_path):
+                messagebox.showerror('エラー', f'既存ファイルが見つかりません:\n{file_path}')
+                return None
+        try:
+            info, sheet_name = check_output_file(file_path, sheet_name, append=(mode != 'new'))
+        except PreflightError as pe:
+            messagebox.showerror('エラー', str(pe))
+            return None
+        return mode, file_path, sheet_name, info
+    
+    def _process_conversion(self, items, target):
         """変換処理をスレッドで実行"""
         data_list = []
         total = len(items)
@@ -548,49 +1106,16 @@ class MonotaroExcelApp:
             self.status_var.set('準備完了')
             return
         
-        mode = self.mode_var.get()
+        # 保存に失敗しても取得し直さずにやり直せるよう、先に取得結果を一時保存しておく
+        mode, file_path, sheet_name, info = target
         try:
-            if mode == 'new':
-                file_path = self.entry_file_path.get().strip()
-                sheet_name = self.entry_sheet_name.get().strip()
-                if not file_path:
-                    self.root.after(0, lambda: messagebox.showwarning('警告', '新規ファイルパスを入力してください'))
-                    self.btn_run.config(state='normal')
-                    self.status_var.set('準備完了')
-                    return
-                if not sheet_name:
-                    sheet_name = '注文内容'
-                success = self.write_to_excel(file_path, sheet_name, data_list, append=False)
-                message = f'Excelファイルに{len(data_list)}件の商品を書き込みました'
-            else:
-                file_path = self.entry_existing_file.get().strip()
-                if not file_path:
-                    self.root.after(0, lambda: messagebox.showwarning('警告', '既存ファイルパスを入力してください'))
-                    self.btn_run.config(state='normal')
-                    self.status_var.set('準備完了')
-                    return
-                # シート名を取得
-                try:
-                    wb = openpyxl.load_workbook(file_path)
-                    sheet_name = wb.sheetnames[0] if wb.sheetnames else '注文内容'
-                except PermissionError:
-                    self.root.after(0, lambda fp=file_path: messagebox.showerror(
-                        'エラー', 
-                        f'ファイルが他のアプリケーションで開かれています。\nファイルを閉じてから実行してください:\n{fp}'
-                    ))
-                    self.btn_run.config(state='normal')
-                    self.status_var.set('準備完了')
-                    return
-                except:
-                    sheet_name = '注文内容'
-                success = self.write_to_excel(file_path, sheet_name, data_list, append=True)
-                message = f'既存ファイルに{len(data_list)}件の商品を追加しました'
-            
-            if success:
-                self.root.after(0, lambda: messagebox.showinfo('完了', message))
+            try:
+                spool_path = save_spool(mode, file_path, sheet_name, data_list)
+            except OSError as e:
+                print(f'取得結果の一時保存に失敗: {e}')
+                spool_path = None
+            if self.save_with_retry(mode, file_path, sheet_name, data_list, spool_path, info):
                 self.root.after(0, lambda: self.listbox.delete(0, tk.END))
-            else:
-                self.root.after(0, lambda: messagebox.showerror('エラー', 'Excelファイルの書き込みに失敗しました'))
         
         except PermissionError as pe:
             self.root.after(0, lambda msg=str(pe): messagebox.showerror('エラー', msg))
@@ -0,0 +1,13 @@
+"""
+アプリのデータ保存先
+キャッシュなどは %LOCALAPPDATA%\\UnifiedOrder（Windows以外は ~/.cache/UnifiedOrder）に置く
+"""
+import os
+
+
+def get_app_data_dir() -> str:
+    """アプリ用データディレクトリを返す（なければ作成）"""
+    base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache')
+    path = os.path.join(base, 'UnifiedOrder')
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -0,0 +1,138 @@
+"""
+ホスト単位のサーキットブレーカー
+ボット対策・メンテナンス・429/503 が続いたホストへの送信を止め、
+待機時間が過ぎたら1件だけ試し（プローブ）、通れば待っていた全件をまとめて再開する
+"""
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+import threading
+import time
+
+CLOSED = 'closed'        # 通常
+OPEN = 'open'            # 停止中（待機時間が過ぎるまで送らない）
+HALF_OPEN = 'half_open'  # プローブ送信中
+
+
+class CircuitOpenError(Exception):
+    """ホストが停止中のまま待機時間の上限を超えた"""
+    pass
+
+
+class CircuitBreaker:
+    """1ホスト分のサーキットブレーカー"""
+    
+    def __init__(self, threshold: int = 3, cooldown: float = 30.0, max_cooldown: float = 300.0,
+                 probe_timeout: float = 60.0):
+        self.threshold = max(1, int(threshold))   # 何回連続でブロックされたら止めるか
+        self.cooldown = cooldown                  # 最初の停止時間（秒）
+        self.max_cooldown = max_cooldown          # プローブ失敗で倍々にする停止時間の上限
+        self.probe_timeout = probe_timeout        # 結果が報告されないプローブを諦めるまでの時間
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0
+        self._current_cooldown = cooldown
+        self._open_until = 0.0
+        self._probe_started = 0.0
+        self._cond = threading.Condition()
+    
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """
+        送信してよくなるまで待つ（停止中に待機時間が過ぎたら、最初の1件がプローブとして通る）
+        timeout 秒以内に通れなければ False
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if self.state == CLOSED:
+                    return True
+                if (self.state == OPEN and now >= self._open_until) or \
+                        (self.state == HALF_OPEN and now - self._probe_started >= self.probe_timeout):
+                    self.state = HALF_OPEN
+                    self._probe_started = now
+                    return True
+                
+                wake = self._open_until if self.state == OPEN else self._probe_started + self.probe_timeout
+                if deadline is not None:
+                    if now >= deadline:
+                        return False
+                    wake = min(wake, deadline)
+                self._cond.wait(max(0.0, wake - now))
+    
+    def record_success(self):
+        """正常なページが取れた（停止中なら再開し、待っている全件を起こす）"""
+        with self._cond:
+            was_blocked = self.state != CLOSED
+            self.state = CLOSED
+            self.failures = 0
+            self._current_cooldown = self.cooldown
+            if was_blocked:
+                self._cond.notify_all()
+    
+    def record_block(self):
+        """ボット対策・メンテナンス・429/503 を検出した"""
+        with self._cond:
+            self.failures += 1
+            if self.state == HALF_OPEN:
+                # プローブも失敗: 停止時間を延ばして止め直す
+                self._current_cooldown = min(self.max_cooldown, self._current_cooldown * 2)
+                self._open(reopen=True)
+            elif self.state == CLOSED and self.failures >= self.threshold:
+                self._open()
+    
+    def _open(self, reopen: bool = False):
+        self.state = OPEN
+        self._open_until = time.monotonic() + self._current_cooldown
+        if not reopen:
+            self.trips += 1
+        self._cond.notify_all()
+
+
+class HostBreakers:
+    """
+    ホスト名ごとのサーキットブレーカーを管理する
+    プロキシ経由の送信は (ホスト, プロキシ) の組ごとに分け、1つのプロキシがブロックされても他は止めない
+    """
+    
+    def __init__(self):
+        self._settings: Dict[str, Tuple[int, float]] = {}
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+        self._lock = threading.Lock()
+    
+    def configure(self, host: str, threshold: int = 3, cooldown: float = 30.0):
+        """ホストの設定（既に設定済みなら上書きしない）"""
+        host = host.lower()
+        with self._lock:
+            self._settings.setdefault(host, (threshold, cooldown))
+    
+    def get(self, url: str, proxy: Optional[str] = None) -> Optional[CircuitBreaker]:
+        """URLのホスト（とプロキシ）のブレーカー（ホストが未設定なら None）"""
+        host = (urlparse(url).hostname or '').lower()
+        with self._lock:
+            settings = self._settings.get(host)
+            if settings is None:
+                return None
+            key = (host, proxy or '')
+            if key not in self._breakers:
+                self._breakers[key] = CircuitBreaker(*settings)
+            return self._breakers[key]
+    
+    def wait_ready(self, url: str, timeout: Optional[float] = None, proxy: Optional[str] = None):
+        """URLのホストに送信できるまで待つ（timeout 内に再開しなければ CircuitOpenError）"""
+        breaker = self.get(url, proxy)
+        if breaker is not None and not breaker.wait_ready(timeout):
+            raise CircuitOpenError(f'{urlparse(url).hostname} は停止中です（ボット対策・メンテナンスの可能性）')
+    
+    def record_success(self, url: str, proxy: Optional[str] = None):
+        breaker = self.get(url, proxy)
+        if breaker is not None:
+            breaker.record_success()
+    
+    def record_block(self, url: str, proxy: Optional[str] = None):
+        breaker = self.get(url, proxy)
+        if breaker is not None:
+            breaker.record_block()
+
+
+# 全スクレイパー共有のブレーカー
+host_breakers = HostBreakers()
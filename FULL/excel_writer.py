@@ -0,0 +1,171 @@
+"""
+新規Excelの書き出し（ストリーミング）
+XlsxWriter がインストールされていればそれを、なければ openpyxl の write_only モードを使い、
+行を1行ずつファイルへ流してブック全体をメモリに持たない。
+文字列として扱う列（注文コード・型番など）の書式は列単位で設定する。
+環境変数 ORDER_EXCEL_WRITER（xlsxwriter / openpyxl）で明示的に指定することもできる
+"""
+from typing import Optional, List, Sequence, Iterable, Dict, Any
+import os
+import unicodedata
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment
+from openpyxl.utils import get_column_letter
+
+try:
+    import xlsxwriter
+    from xlsxwriter.exceptions import FileCreateError
+    XLSXWRITER_AVAILABLE = True
+except ImportError:
+    XLSXWRITER_AVAILABLE = False
+
+WRITER_ENV = 'ORDER_EXCEL_WRITER'
+TEXT_FORMAT = '@'
+
+
+def get_writer_name() -> str:
+    """使用する書き出しライブラリ名を返す"""
+    forced = (os.environ.get(WRITER_ENV) or '').strip().lower()
+    if forced == 'openpyxl' or (forced == 'xlsxwriter' and XLSXWRITER_AVAILABLE):
+        return forced
+    return 'xlsxwriter' if XLSXWRITER_AVAILABLE else 'openpyxl'
+
+
+def display_width(value) -> int:
+    """セルの値の表示幅（全角文字は2、結合文字は0として数える）"""
+    if value is None:
+        return 0
+    text = str(value)
+    if text.isascii():
+        return len(text)
+    width = 0
+    for ch in text:
+        if unicodedata.combining(ch):
+            continue
+        width += 2 if unicodedata.east_asian_width(ch) in ('F', 'W') else 1
+    return width
+
+
+def measure_widths(rows: Iterable[Sequence[Any]]) -> Dict[int, int]:
+    """列番号（1始まり）ごとの最大表示幅"""
+    widths: Dict[int, int] = {}
+    for row in rows:
+        for idx, val in enumerate(row, start=1):
+            length = display_width(val)
+            if length > widths.get(idx, 0):
+                widths[idx] = length
+    return widths
+
+
+class SheetLayout:
+    """書き出すシートの体裁（ヘッダ書式・文字列列・列幅の範囲）"""
+    
+    def __init__(self, headers: Sequence[str], text_columns: Sequence[int] = (),
+                 header_fill: str = 'DDDDDD', header_center: bool = False,
+                 min_width: int = 0, max_width: int = 50):
+        self.headers = list(headers)
+        self.text_columns = frozenset(text_columns)  # 文字列として書く列（1始まり）
+        self.header_fill = header_fill
+        self.header_center = header_center
+        self.min_width = min_width
+        self.max_width = max_width
+    
+    def column_width(self, length: int) -> int:
+        """最大表示幅から列幅を決める"""
+        return min(max(length + 2, self.min_width), self.max_width)
+    
+    def cell_value(self, col: int, value):
+        """文字列列の値は str にそろえる（None は空文字）"""
+        if col in self.text_columns:
+            return '' if value is None else str(value)
+        return value
+
+
+def write_new_workbook(path: str, sheet_name: str, layout: SheetLayout, rows: List[Sequence[Any]],
+                       writer: Optional[str] = None):
+    """
+    ヘッダ＋rows の1シートだけの新規ブックを書き出す
+    列幅は書き出し前に値から計算する（write_only では列設定を先に書く必要があるため）
+    
+    Args:
+        writer: 'xlsxwriter' / 'openpyxl'（省略時は get_writer_name()）
+    """
+    widths = measure_widths([layout.headers] + list(rows))
+    if (writer or get_writer_name()) == 'xlsxwriter' and XLSXWRITER_AVAILABLE:
+        _write_xlsxwriter(path, sheet_name, layout, rows, widths)
+    else:
+        _write_openpyxl(path, sheet_name, layout, rows, widths)
+
+
+def _write_openpyxl(path, sheet_name, layout: SheetLayout, rows, widths):
+    """openpyxl の write_only モードで書き出す"""
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_name)
+    
+    # 列幅と文字列書式は列単位で設定（最初の行より前に決める）
+    for col, length in widths.items():
+        dim = ws.column_dimensions[get_column_letter(col)]
+        dim.width = layout.column_width(length)
+        if col in layout.text_columns:
+            dim.number_format = TEXT_FORMAT
+    
+    header_font = Font(bold=True)
+    header_fill = PatternFill('solid', fgColor=layout.header_fill)
+    header_align = Alignment(horizontal='center', vertical='center') if layout.header_center else None
+    header = []
+    for title in layout.headers:
+        cell = WriteOnlyCell(ws, value=title)
+        cell.font = header_font
+        cell.fill = header_fill
+        if header_align is not None:
+            cell.alignment = header_align
+        header.append(cell)
+    ws.append(header)
+    
+    for row in rows:
+        out = []
+        for col, value in enumerate(row, start=1):
+            if col in layout.text_columns:
+                cell = WriteOnlyCell(ws, value=layout.cell_value(col, value))
+                cell.number_format = TEXT_FORMAT
+                out.append(cell)
+            else:
+                out.append(value)
+        ws.append(out)
+    
+    wb.save(path)
+
+
+def _write_xlsxwriter(path, sheet_name, layout: SheetLayout, rows, widths):
+    """XlsxWriter で書き出す（constant_memory で1行ずつファイルへ流す）"""
+    wb = xlsxwriter.Workbook(path, {'constant_memory': True, 'strings_to_urls': False})
+    try:
+        ws = wb.add_worksheet(sheet_name)
+        text_fmt = wb.add_format({'num_format': TEXT_FORMAT})
+        header_props = {'bold': True, 'bg_color': '#' + layout.header_fill, 'pattern': 1}
+        if layout.header_center:
+            header_props.update({'align': 'center', 'valign': 'vcenter'})
+        header_fmt = wb.add_format(header_props)
+        
+        for col, length in widths.items():
+            fmt = text_fmt if col in layout.text_columns else None
+            ws.set_column(col - 1, col - 1, layout.column_width(length), fmt)
+        
+        for c, title in enumerate(layout.headers):
+            ws.write_string(0, c, title, header_fmt)
+        for r, row in enumerate(rows, start=1):
+            for col, value in enumerate(row, start=1):
+                if col in layout.text_columns:
+                    ws.write_string(r, col - 1, layout.cell_value(col, value), text_fmt)
+                elif value is not None and value != '':
+                    ws.write(r, col - 1, value)
+    finally:
+        try:
+            wb.close()
+        except FileCreateError as e:
+            # 開かれているファイルは openpyxl と同じく PermissionError として返す
+            cause = e.args[0] if e.args else None
+            if isinstance(cause, PermissionError):
+                raise cause
+            raise
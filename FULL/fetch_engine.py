@@ -0,0 +1,91 @@
+"""
+並列取得エンジン
+サイトごとにワーカー数を制限したスレッドプールで商品情報を取得し、
+結果をリストの順番どおりに並べ直して返す
+"""
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Optional, Dict, Any, List, Callable
+
+
+class FetchJob:
+    """取得ジョブ（リスト1行分）"""
+    
+    def __init__(self, index: int, url: str, quantity: int, scraper):
+        self.index = index          # リスト内の位置
+        self.url = url
+        self.quantity = quantity
+        self.scraper = scraper
+        self.result: Optional[Dict[str, Any]] = None
+
+
+class FetchEngine:
+    """サイト（スクレイパー）単位でワーカー数を制限して並列取得する"""
+    
+    def __init__(self, on_progress: Optional[Callable[[int, int, FetchJob], None]] = None,
+                 stop_on_failure: bool = True, force_refresh: bool = False):
+        # on_progress(完了件数, 全件数, 完了したジョブ)
+        self.on_progress = on_progress
+        self.stop_on_failure = stop_on_failure
+        self.force_refresh = force_refresh  # 商品情報キャッシュを使わない
+    
+    def run(self, jobs: List[FetchJob]) -> List[FetchJob]:
+        """
+        ジョブを並列実行する
+        
+        Returns:
+            失敗したジョブのリスト（リスト順）。成功分は job.result に格納される
+        """
+        executors: Dict[int, ThreadPoolExecutor] = {}
+        scrapers = {}
+        futures = {}
+        failed: List[FetchJob] = []
+        done_count = 0
+        total = len(jobs)
+        
+        try:
+            for job in jobs:
+                key = id(job.scraper)
+                if key not in executors:
+                    scrapers[key] = job.scraper
+                    # 再試行の待ち時間の合計（実行単位の上限）をリセット
+                    job.scraper.retry_policy.new_run()
+                    executors[key] = ThreadPoolExecutor(
+                        max_workers=max(1, int(job.scraper.max_workers)),
+                        thread_name_prefix=f'fetch-{job.scraper.__class__.__name__}',
+                    )
+                futures[executors[key].submit(self._fetch_one, job)] = job
+            
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    job = futures[fut]
+                    try:
+                        job.result = fut.result()
+                    except Exception as e:
+                        print(f'取得エラー: {e}, URL: {job.url}')
+                        job.result = None
+                    done_count += 1
+                    if job.result is None:
+                        failed.append(job)
+                    if self.on_progress:
+                        self.on_progress(done_count, total, job)
+                
+                # 1件でも失敗したら未着手のジョブを取り消す（実行中のものは完了を待つ）
+                if failed and self.stop_on_failure:
+                    for fut in pending:
+                        fut.cancel()
+                    pending = {f for f in pending if not f.cancelled()}
+        finally:
+            for ex in executors.values():
+                ex.shutdown(wait=True)
+            for scraper in scrapers.values():
+                scraper.close()
+        
+        failed.sort(key=lambda j: j.index)
+        return failed
+    
+    def _fetch_one(self, job: FetchJob) -> Optional[Dict[str, Any]]:
+        """1件取得（ワーカースレッドで実行）"""
+        # リクエスト間隔はホストごとのスケジューラが制御する
+        return job.scraper.get_product(job.url, force_refresh=self.force_refresh)
@@ -0,0 +1,148 @@
+"""
+HTMLパーサーの切り替え
+lxml がインストールされていれば高速な lxml を、なければ標準の html.parser を使う。
+環境変数 ORDER_HTML_PARSER（lxml / html.parser）で明示的に指定することもできる
+"""
+from typing import Optional, List, Tuple
+import bisect
+import os
+import re
+from bs4 import BeautifulSoup
+
+try:
+    import lxml  # noqa: F401
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+PARSER_ENV = 'ORDER_HTML_PARSER'
+
+
+def get_parser_name() -> str:
+    """使用するBeautifulSoupのパーサー名を返す"""
+    forced = (os.environ.get(PARSER_ENV) or '').strip().lower()
+    if forced == 'html.parser' or (forced == 'lxml' and LXML_AVAILABLE):
+        return forced
+    return 'lxml' if LXML_AVAILABLE else 'html.parser'
+
+
+def make_soup(markup, parser: str = None, **kwargs) -> BeautifulSoup:
+    """選択中のパーサーでBeautifulSoupを作成"""
+    return BeautifulSoup(markup, parser or get_parser_name(), **kwargs)
+
+
+# ============ 部分解析（必要な領域だけを切り出して解析する） ============
+
+_VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source', 'track', 'wbr'}
+_OPEN_TAG_RE = re.compile(r'<([a-zA-Z][a-zA-Z0-9-]*)\b[^>]*?(/?)>')
+# 中のタグらしき文字列を要素として扱わない部分（スクリプト・スタイル・コメント）
+_OPAQUE_RE = re.compile(r'<script\b.*?</script\s*>|<style\b.*?</style\s*>|<!--.*?-->', re.IGNORECASE | re.DOTALL)
+
+
+def class_marker(class_name: str, tag: str = r'[a-zA-Z][a-zA-Z0-9-]*') -> str:
+    """指定クラスを持つ開始タグにマッチする正規表現"""
+    return r'<%s\b[^>]*\bclass=["\']?[^"\'>]*(?<![\w-])%s(?![\w-])' % (tag, re.escape(class_name))
+
+
+def id_marker(element_id: str, tag: str = r'[a-zA-Z][a-zA-Z0-9-]*') -> str:
+    """指定IDを持つ開始タグにマッチする正規表現"""
+    return r'<%s\b[^>]*\bid=["\']?%s["\'\s>]' % (tag, re.escape(element_id))
+
+
+class _OpaqueSpans:
+    """スクリプト・スタイル・コメントの範囲（位置がその中かを二分探索で判定する）"""
+    
+    def __init__(self, html: str):
+        self.starts = []
+        self.ends = []
+        for m in _OPAQUE_RE.finditer(html):
+            self.starts.append(m.start())
+            self.ends.append(m.end())
+    
+    def start_of(self, pos: int) -> int:
+        """pos を含む範囲の先頭（範囲外なら -1）"""
+        i = bisect.bisect_right(self.starts, pos) - 1
+        if i >= 0 and pos < self.ends[i]:
+            return self.starts[i]
+        return -1
+    
+    def contains(self, pos: int) -> bool:
+        return self.start_of(pos) != -1
+
+
+def _element_end(html: str, start: int, opaque: Optional[_OpaqueSpans] = None) -> int:
+    """start にある開始タグに対応する終了タグの末尾位置（見つからなければ -1）"""
+    m = _OPEN_TAG_RE.match(html, start)
+    if not m:
+        return -1
+    name = m.group(1).lower()
+    if m.group(2) or name in _VOID_TAGS:
+        return m.end()
+    depth = 0
+    tag_re = re.compile(r'<(/?)%s\b[^>]*?(/?)>' % re.escape(name), re.IGNORECASE)
+    for t in tag_re.finditer(html, start):
+        if opaque is not None and opaque.contains(t.start()):
+            continue
+        if t.group(1):
+            depth -= 1
+            if depth == 0:
+                return t.end()
+        elif not t.group(2):
+            depth += 1
+    return -1
+
+
+def _parent_start(html: str, pos: int, opaque: Optional[_OpaqueSpans] = None) -> int:
+    """pos にある要素を含む親要素の開始位置（見つからなければ -1）"""
+    p = pos
+    while True:
+        p = html.rfind('<', 0, p)
+        if p < 0:
+            return -1
+        if opaque is not None and opaque.contains(p):
+            p = opaque.start_of(p)  # スクリプト等の中は飛ばす
+            continue
+        m = _OPEN_TAG_RE.match(html, p)
+        if not m or m.group(2) or m.group(1).lower() in _VOID_TAGS:
+            continue
+        end = _element_end(html, p, opaque)
+        if end == -1 or end > pos:
+            return p
+
+
+def slice_regions(html: str, regions: List[Tuple[str, int]]) -> Optional[str]:
+    """
+    指定領域の要素だけを文書順に切り出したHTMLを返す（1つも見つからなければ None）
+    
+    Args:
+        regions: (開始タグにマッチする正規表現, 何階層上の要素を取るか) のリスト
+    """
+    opaque = _OpaqueSpans(html)
+    spans = []
+    for pattern, levels_up in regions:
+        for m in re.finditer(pattern, html, re.IGNORECASE):
+            start = m.start()
+            if opaque.contains(start):
+                continue  # スクリプトの文字列などに書かれたタグは要素ではない
+            for _ in range(levels_up):
+                start = _parent_start(html, start, opaque)
+                if start < 0:
+                    break
+            if start < 0:
+                continue
+            end = _element_end(html, start, opaque)
+            if end > start:
+                spans.append((start, end))
+    if not spans:
+        return None
+    
+    # 重なり（入れ子）を除いて文書順に連結
+    spans.sort()
+    parts = []
+    last_end = -1
+    for start, end in spans:
+        if start < last_end:
+            continue
+        parts.append(html[start:end])
+        last_end = end
+    return '<html><body>' + '\n'.join(parts) + '</body></html>'
@@ -0,0 +1,123 @@
+"""
+HTTPレスポンスのディスクキャッシュ
+本文をzlib圧縮してSQLiteに保存し、ETag / Last-Modified で条件付きGETする。
+合計サイズが上限を超えたら最終アクセスが古いものから削除する（LRU）
+"""
+from typing import Optional, Dict, Any
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from app_paths import get_app_data_dir
+
+# 保存するレスポンスヘッダ
+_KEEP_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+class ResponseCache:
+    """URL（正規化済み）をキーにしたレスポンスキャッシュ"""
+    
+    def __init__(self, path: str, max_bytes: int = 200 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            ' key TEXT PRIMARY KEY,'
+            ' headers TEXT NOT NULL,'
+            ' body BLOB NOT NULL,'
+            ' size INTEGER NOT NULL,'
+            ' last_access REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_access ON responses(last_access)')
+        self._conn.commit()
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """キャッシュエントリを返す（{'headers': dict, 'body': bytes}）"""
+        with self._lock:
+            row = self._conn.execute('SELECT headers, body FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute('UPDATE responses SET last_access = ? WHERE key = ?', (time.time(), key))
+            self._conn.commit()
+        try:
+            return {'headers': json.loads(row[0]), 'body': zlib.decompress(row[1])}
+        except Exception:
+            self.discard(key)
+            return None
+    
+    def put(self, key: str, response: requests.Response):
+        """200レスポンスを保存（検証用ヘッダがないものは保存しない）"""
+        headers = {h: response.headers[h] for h in _KEEP_HEADERS if h in response.headers}
+        if 'ETag' not in headers and 'Last-Modified' not in headers:
+            return
+        body = zlib.compress(response.content)
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses (key, headers, body, size, last_access) VALUES (?, ?, ?, ?, ?)',
+                (key, json.dumps(headers), body, len(body), time.time())
+            )
+            self._evict()
+            self._conn.commit()
+    
+    def discard(self, key: str):
+        """エントリを削除"""
+        with self._lock:
+            self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+            self._conn.commit()
+    
+    def _evict(self):
+        """上限サイズを超えた分を古い順に削除（ロック取得済みで呼ぶ）"""
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute('SELECT key, size FROM responses ORDER BY last_access').fetchall():
+            self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+    
+    @staticmethod
+    def conditional_headers(entry: Dict[str, Any]) -> Dict[str, str]:
+        """再検証用のリクエストヘッダ"""
+        headers = {}
+        if entry['headers'].get('ETag'):
+            headers['If-None-Match'] = entry['headers']['ETag']
+        if entry['headers'].get('Last-Modified'):
+            headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+        return headers
+    
+    @staticmethod
+    def to_response(entry: Dict[str, Any], url: str) -> requests.Response:
+        """キャッシュエントリから200レスポンスを組み立てる"""
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.url = url
+        resp.headers = CaseInsensitiveDict(entry['headers'])
+        resp.encoding = get_encoding_from_headers(resp.headers)
+        resp._content = entry['body']
+        resp.from_cache = True
+        return resp
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """全スクレイパー共有のキャッシュを返す（作成できない場合は None）"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            try:
+                _shared_cache = ResponseCache(os.path.join(get_app_data_dir(), 'http_cache.sqlite3'))
+            except Exception as e:
+                print(f'HTTPキャッシュを開けません: {e}')
+                return None
+        return _shared_cache
@@ -1,6 +1,6 @@
 """
 統合注文情報Excel作成ツール
-モノタロウ・秋月電子などの商品情報を自動取得してExcelにまとめる
+モノタロウ・秋月電子・Amazonなどの商品情報を自動取得してExcelにまとめる
 """
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
@@ -8,12 +8,21 @@ import openpyxl
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Font, PatternFill, Alignment
 import threading
-import time
 import re
 
 # スクレイパーモジュールをインポート
 from scraper_monotaro import MonotaroScraper
 from scraper_akizuki import AkizukiScraper
+from scraper_amazon import AmazonScraper
+from fetch_engine import FetchEngine, FetchJob
+from text_encoding import get_encoding_stats, log_encoding_stats
+from excel_writer import SheetLayout, write_new_workbook, measure_widths
+from xlsx_append import append_rows, SheetNotFound, WorkbookInfo
+from output_preflight import PreflightError, check_new_output, check_append_output
+from result_spool import save_spool, load_spool, remove_spool, pending_spools
+
+# 注文シートの列
+ORDER_HEADERS = ['メーカー', '注文コード', '商品名', '品番/型番', '単価（税別）', '数量', '値段（税別）', 'URL', '税込み']
 
 
 class UnifiedOrderApp:
@@ -23,17 +32,23 @@ class UnifiedOrderApp:
         self.root.geometry('900x750')
         
         self.mode_var = tk.StringVar(value='new')
+        self.force_refresh_var = tk.BooleanVar(value=False)  # キャッシュを使わず再取得
+        self.coalesce_var = tk.BooleanVar(value=True)  # 同一商品の行をまとめる
         
         # スクレイパーを登録
         self.scrapers = [
             MonotaroScraper(),
             AkizukiScraper(),
+            AmazonScraper(),
             # 今後他のサイト用スクレイパーをここに追加
         ]
         
         self.current_site = None  # 現在追加中のサイト
         
         self.create_widgets()
+        
+        # 前回保存できなかった取得結果があれば保存し直す
+        self.root.after(500, self.restore_spools)
     
     def create_widgets(self):
         # === モード選択 ===
@@ -113,6 +128,8 @@ class UnifiedOrderApp:
         run_frame = ttk.LabelFrame(self.root, text='5. 実行')
         run_frame.pack(fill='x', padx=10, pady=8)
         ttk.Button(run_frame, text='変換実行', command=self.run_conversion).pack(side='left', padx=5, pady=5)
+        ttk.Checkbutton(run_frame, text='キャッシュを使わず再取得', variable=self.force_refresh_var).pack(side='left', padx=10, pady=5)
+        ttk.Checkbutton(run_frame, text='同一商品をまとめる（数量を合算）', variable=self.coalesce_var).pack(side='left', padx=10, pady=5)
         
         # === ステータス ===
         self.status_var = tk.StringVar(value='準備完了')
@@ -164,29 +181,19 @@ class UnifiedOrderApp:
         return None
     
     def update_current_site(self):
-        """リストの一番上の項目から現在のサイトを判定"""
-        if self.listbox.size() == 0:
-            self.current_site = None
-            self.site_label_var.set('現在のサイト: なし')
-            return
-        
-        # 一番上の項目を取得
-        first_item = self.listbox.get(0)
-        m = re.match(r'(.+?)\s+\|\s+個数:\s*(\d+)', first_item)
-        if not m:
-            self.current_site = None
-            self.site_label_var.set('現在のサイト: なし')
-            return
-        
-        url = m.group(1).strip()
-        scraper = self.get_scraper_for_url(url)
-        
-        if scraper:
-            self.current_site = scraper.get_site_name()
-            self.site_label_var.set(f'現在のサイト: {self.current_site}')
-        else:
-            self.current_site = None
-            self.site_label_var.set('現在のサイト: 不明')
+        """リストに含まれるサイトを判定（複数サイトの商品を混ぜてよい。取得はサイトごとに並列化される）"""
+        sites = []
+        for item in self.listbox.get(0, 'end'):
+            m = re.match(r'(.+?)\s+\|\s+個数:\s*(\d+)', item)
+            if not m:
+                continue
+            scraper = self.get_scraper_for_url(m.group(1).strip())
+            name = scraper.get_site_name() if scraper else '不明'
+            if name not in sites:
+                sites.append(name)
+        
+        self.current_site = sites[0] if sites else None
+        self.site_label_var.set(f'現在のサイト: {"、".join(sites) if sites else "なし"}')
     
     def on_list_change(self, event=None):
         """リスト変更時の処理"""
@@ -204,17 +211,7 @@ class UnifiedOrderApp:
         # URLに対応するスクレイパーを取得
         scraper = self.get_scraper_for_url(url)
         if not scraper:
-            messagebox.showwarning('警告', '対応していないサイトのURLです。\n対応サイト: モノタロウ、秋月電子通商')
-            return
-        
-        # 現在のサイトと異なる場合は警告
-        if self.current_site and scraper.get_site_name() != self.current_site:
-            messagebox.showwarning(
-                '警告',
-                f'現在のリストは「{self.current_site}」の商品です。\n'
-                f'「{scraper.get_site_name()}」の商品は追加できません。\n\n'
-                f'別のサイトの商品を追加する場合は、リストをクリアしてください。'
-            )
+            messagebox.showwarning('警告', '対応していないサイトのURLです。\n対応サイト: モノタロウ、秋月電子通商、Amazon')
             return
         
         if not qty_str.isdigit() or int(qty_str) < 1:
@@ -243,7 +240,10 @@ class UnifiedOrderApp:
         self.update_current_site()
     
     def set_status(self, text):
-        """ステータス更新"""
+        """ステータス更新（ワーカースレッドから呼ばれたらTkのスレッドで更新する）"""
+        if threading.current_thread() is not threading.main_thread():
+            self.root.after(0, self.status_var.set, text)
+            return
         self.status_var.set(text)
         self.root.update_idletasks()
     
@@ -267,18 +267,56 @@ class UnifiedOrderApp:
                 messagebox.showwarning('警告', '追記先のExcelファイルを指定してください。')
                 return
         
+        # 取得を始める前に保存先に書き込めるかを確かめる
+        self.set_status('保存先を確認中...')
+        target = self.get_output_target(mode)
+        try:
+            info = self.preflight_output(mode, *target)
+        except PreflightError as pe:
+            messagebox.showerror('エラー', str(pe))
+            self.set_status('準備完了')
+            return
+        
+        # 画面の値はワーカースレッドから読まないよう、ここで取り出して渡す
+        entries = list(self.listbox.get(0, 'end'))
         self.set_status('処理を開始します...')
-        thread = threading.Thread(target=self.worker_process, daemon=True)
+        thread = threading.Thread(target=self.worker_process, args=(entries, mode, target, info),
+                                  kwargs={'coalesce': self.coalesce_var.get(),
+                                          'force_refresh': self.force_refresh_var.get()},
+                                  daemon=True)
         thread.start()
     
-    def worker_process(self):
-        """ワーカースレッド - 商品情報取得とExcel書き込み"""
+    def get_output_target(self, mode: str):
+        """(保存先のパス, シート名)"""
+        if mode == 'new':
+            return self.save_path_var.get().strip(), self.sheet_name_var.get().strip()
+        return self.append_file_var.get().strip(), self.sheet_name_var.get().strip() or '注文内容'
+    
+    def preflight_output(self, mode: str, path: str, sheet_name: str):
+        """
+        保存先の事前チェック（書き込めなければ PreflightError）
+        追記の場合はブックの構成情報を返し、追記でそのまま使う
+        """
+        if mode == 'new':
+            check_new_output(path, sheet_name)
+            return None
+        return check_append_output(path, sheet_name)
+    
+    def worker_process(self, entries: list, mode: str, target: tuple, info: WorkbookInfo = None,
+                       coalesce: bool = True, force_refresh: bool = False):
+        """
+        ワーカースレッド - 商品情報取得とExcel書き込み
+        画面の操作（ステータス・ダイアログ・リスト）はすべて call_in_ui / root.after でTkのスレッドに回す
+        
+        Args:
+            entries: リストの各行（「URL | 個数: N」）
+            target: (保存先のパス, シート名)
+        """
         try:
-            items = []
-            failed_urls = []  # 失敗したURL
+            jobs = []
+            job_by_key = {}  # (サイト名, 正規化URL) -> ジョブ
             
-            for i in range(self.listbox.size()):
-                text = self.listbox.get(i)
+            for text in entries:
                 m = re.match(r'(.+?)\s+\|\s+個数:\s*(\d+)', text)
                 if not m:
                     continue
@@ -286,145 +324,219 @@ class UnifiedOrderApp:
                 url = m.group(1).strip()
                 qty = int(m.group(2))
                 
-                self.set_status(f'取得中 ({i+1}/{self.listbox.size()}): {url[:50]}...')
-                
                 # URLに対応するスクレイパーを取得
                 scraper = self.get_scraper_for_url(url)
                 if not scraper:
-                    failed_urls.append(url)
                     continue
                 
-                # 商品情報を取得
-                product = scraper.fetch_product_data(url)
-                if product is None:
-                    failed_urls.append(url)
-                    # 1件でも失敗したら即エラー表示・処理中断（モノタロウ仕様）
-                    error_message = '以下のURLを正しく開けませんでした。\nURLが商品ページまで指定していることを確認してください:\n\n'
-                    error_message += f'• {url}\n'
-                    self.root.after(0, lambda msg=error_message: messagebox.showerror('エラー', msg))
-                    self.set_status('準備完了')
-                    return
+                # 同一商品は1回だけ取得し、数量を合算する
+                key = (scraper.get_site_name(), scraper.canonicalize_url(url))
+                if coalesce and key in job_by_key:
+                    job_by_key[key].quantity += qty
+                    continue
                 
-                product['quantity'] = qty
+                job = FetchJob(len(jobs), url, qty, scraper)
+                job_by_key[key] = job
+                jobs.append(job)
+            
+            # 商品情報を並列取得（サイトごとのワーカー数で制限）
+            def on_progress(done, total, job):
+                self.set_status(f'取得中 ({done}/{total}): {job.url[:50]}...')
+            
+            engine = FetchEngine(on_progress=on_progress, force_refresh=force_refresh)
+            encoding_before = get_encoding_stats()
+            failed = engine.run(jobs)
+            log_encoding_stats(encoding_before)
+            if failed:
+                # 1件でも失敗したらエラー表示・処理中断（モノタロウ仕様）
+                error_message = '以下のURLを正しく開けませんでした。\nURLが商品ページまで指定していることを確認してください:\n\n'
+                for job in failed:
+                    error_message += f'• {job.url}\n'
+                self.root.after(0, lambda msg=error_message: messagebox.showerror('エラー', msg))
+                self.set_status('準備完了')
+                return
+            
+            # リストの順番どおりに並べる
+            items = []
+            for job in sorted(jobs, key=lambda j: j.index):
+                product = job.result
+                product['quantity'] = job.quantity
                 items.append(product)
-                
-                # サイトに応じた待機時間
-                if scraper.get_site_name() == '秋月電子通商':
-                    time.sleep(0.7)
-                else:
-                    time.sleep(0.1)
             
             if not items:
-                messagebox.showwarning('警告', '情報を取得できませんでした。ページ構造の変更やメンテナンスの可能性があります。')
+                self.root.after(0, lambda: messagebox.showwarning(
+                    '警告', '情報を取得できませんでした。ページ構造の変更やメンテナンスの可能性があります。'))
                 self.set_status('準備完了')
                 return
             
-            # Excel書き込み
-            mode = self.mode_var.get()
-            if mode == 'new':
-                self.write_new_excel(
-                    self.save_path_var.get().strip(),
-                    self.sheet_name_var.get().strip(),
-                    items
-                )
-                messagebox.showinfo('完了', f'Excelを作成しました:\n{self.save_path_var.get().strip()}')
-            else:
-                sheet = self.sheet_name_var.get().strip() or '注文内容'
-                self.append_to_excel(
-                    self.append_file_var.get().strip(),
-                    sheet,
-                    items
-                )
-                messagebox.showinfo('完了', f'Excelに追記しました:\n{self.append_file_var.get().strip()}')
+            # Excel書き込み（保存に失敗しても取得し直さずにやり直せるよう、先に取得結果を保存しておく）
+            path, sheet = target
+            try:
+                spool_path = save_spool(mode, path, sheet, items)
+            except OSError as e:
+                print(f'取得結果の一時保存に失敗: {e}')
+                spool_path = None
             
-            self.clear_list()
+            if self.save_with_retry(mode, path, sheet, items, spool_path, info):
+                self.root.after(0, self.clear_list)
             self.set_status('準備完了')
         
         except PermissionError as pe:
             self.root.after(0, lambda msg=str(pe): messagebox.showerror('エラー', msg))
             self.set_status('準備完了')
         except Exception as e:
-            messagebox.showerror('エラー', f'処理中にエラーが発生しました:\n{e}')
+            self.root.after(0, lambda msg=str(e): messagebox.showerror('エラー', f'処理中にエラーが発生しました:\n{msg}'))
             self.set_status('準備完了')
     
-    def write_new_excel(self, path: str, sheet_name: str, items: list):
-        """新規Excel作成"""
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = sheet_name
-        
-        headers = ['メーカー', '注文コード', '商品名', '品番/型番', '単価（税別）', '数量', '値段（税別）', 'URL', '税込み']
-        ws.append(headers)
+    def save_items(self, mode: str, path: str, sheet_name: str, items: list, info: WorkbookInfo = None):
+        """取得結果をExcelに書き込む"""
+        if mode == 'new':
+            self.write_new_excel(path, sheet_name, items)
+        else:
+            self.append_to_excel(path, sheet_name, items, info)
+    
+    def call_in_ui(self, func, *args):
+        """Tkのスレッドで func を実行して結果を返す（ワーカースレッドからダイアログを出すときに使う）"""
+        if threading.current_thread() is threading.main_thread():
+            return func(*args)
+        done = threading.Event()
+        result = []
+        
+        def run():
+            try:
+                result.append(func(*args))
+            finally:
+                done.set()
         
-        # ヘッダ書式設定（秋月スタイル）
-        header_font = Font(bold=True)
-        header_fill = PatternFill('solid', fgColor='DDDDDD')
-        for col_idx, _ in enumerate(headers, start=1):
-            cell = ws.cell(row=1, column=col_idx)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal='center', vertical='center')
+        self.root.after(0, run)
+        done.wait()
+        return result[0] if result else None
+    
+    def save_with_retry(self, mode: str, path: str, sheet_name: str, items: list, spool_path: str = None,
+                        info: WorkbookInfo = None) -> bool:
+        """
+        Excelに書き込み、失敗したら再試行するか確認する
+        保存できたらスプールを消して True。やめた場合はスプールを残す（次回起動時に保存し直せる）
+        """
+        while True:
+            self.set_status('Excelに書き込み中...')
+            try:
+                self.save_items(mode, path, sheet_name, items, info)
+                break
+            except Exception as e:
+                info = None  # ファイルが変わっている可能性があるので読み直す
+                kept = '\n\n取得した結果は一時保存してあります。' if spool_path else ''
+                if self.call_in_ui(messagebox.askretrycancel, '保存エラー',
+                                   f'Excelに保存できませんでした:\n{e}{kept}\n\n'
+                                   'ファイルを閉じるなどしてから「再試行」を押してください。'):
+                    continue
+                if spool_path:
+                    self.call_in_ui(messagebox.showinfo, '保存を中止しました',
+                                    '取得した結果は次回起動時に保存し直せます:\n' + spool_path)
+                return False
         
-        # データ行
-        for item in items:
-            price_ex = item.get('price_excl_tax', 0) or 0
-            qty = item.get('quantity', 0) or 0
-            
-            # 価格を数値に変換
-            if isinstance(price_ex, str):
-                try:
-                    price_ex = int(price_ex.replace(',', ''))
-                except:
-                    price_ex = 0
-            
-            total_ex = price_ex * qty
-            
-            price_in = item.get('price_incl_tax', 0) or 0
-            if isinstance(price_in, str):
-                try:
-                    price_in = int(price_in.replace(',', ''))
-                except:
-                    price_in = 0
+        remove_spool(spool_path)
+        if mode == 'new':
+            self.call_in_ui(messagebox.showinfo, '完了', f'Excelを作成しました:\n{path}')
+        else:
+            self.call_in_ui(messagebox.showinfo, '完了', f'Excelに追記しました:\n{path}')
+        return True
+    
+    def restore_spools(self):
+        """前回保存できなかった取得結果を保存し直す（破棄・保留も選べる）"""
+        for spool_path in pending_spools():
+            data = load_spool(spool_path)
+            if data is None:
+                print(f'一時保存ファイルを読めません: {spool_path}')
+                continue
             
-            row = [
-                item.get('supplier', ''),
-                str(item.get('item_code', '')),
-                item.get('name', ''),
-                str(item.get('model', '')),
-                price_ex,
-                qty,
-                total_ex,
-                item.get('url', ''),
-                price_in,
-            ]
-            ws.append(row)
+            mode = 'new' if data.get('mode') == 'new' else 'append'
+            path = data.get('path', '')
+            sheet_name = data.get('sheet_name', '') or '注文内容'
+            items = data['items']
+            action = '新規作成' if mode == 'new' else '追記'
+            answer = messagebox.askyesnocancel(
+                '未保存の取得結果',
+                f'前回保存できなかった取得結果があります（{len(items)}件）。\n'
+                f'保存先: {path}\nシート: {sheet_name}（{action}）\n\n'
+                '今すぐ保存しますか？\n「いいえ」で破棄、「キャンセル」で次回まで保留します。'
+            )
+            if answer is None:
+                continue
+            if not answer:
+                remove_spool(spool_path)
+                continue
             
-            # 商品コードと型番を文字列として設定
-            current_row = ws.max_row
             try:
-                cell_code = ws.cell(row=current_row, column=2)
-                cell_code.value = str(item.get('item_code', ''))
-                cell_code.number_format = '@'
-            except:
-                pass
-            
+                info = self.preflight_output(mode, path, sheet_name)
+            except PreflightError as pe:
+                messagebox.showerror('エラー', f'{pe}\n\n取得結果は次回起動時まで保留します。')
+                continue
+            self.save_with_retry(mode, path, sheet_name, items, spool_path, info)
+        self.set_status('準備完了')
+    
+    def write_new_excel(self, path: str, sheet_name: str, items: list):
+        """新規Excel作成（1行ずつ書き出すのでブック全体をメモリに持たない）"""
+        layout = SheetLayout(ORDER_HEADERS, text_columns=(2, 4), header_fill='DDDDDD', header_center=True,
+                             min_width=10, max_width=50)
+        rows = [self.item_to_row(item) for item in items]
+        try:
+            write_new_workbook(path, sheet_name, layout, rows)
+        except PermissionError:
+            raise PermissionError(f'ファイルが他のアプリケーションで開かれています。\nファイルを閉じてから実行してください:\n{path}')
+    
+    def item_to_row(self, item: dict) -> list:
+        """商品情報を1行分の値にする（商品コード・型番は文字列、価格は数値）"""
+        price_ex = item.get('price_excl_tax', 0) or 0
+        qty = item.get('quantity', 0) or 0
+        
+        # 価格を数値に変換
+        if isinstance(price_ex, str):
             try:
-                cell_model = ws.cell(row=current_row, column=4)
-                cell_model.value = str(item.get('model', ''))
-                cell_model.number_format = '@'
+                price_ex = int(price_ex.replace(',', ''))
             except:
-                pass
+                price_ex = 0
         
-        # 列幅自動調整（秋月スタイル）
-        self.autofit_columns(ws, max_width=50)
+        total_ex = price_ex * qty
         
+        price_in = item.get('price_incl_tax', 0) or 0
+        if isinstance(price_in, str):
+            try:
+                price_in = int(price_in.replace(',', ''))
+            except:
+                price_in = 0
+        
+        return [
+            item.get('supplier', ''),
+            str(item.get('item_code', '')),
+            item.get('name', ''),
+            str(item.get('model', '')),
+            price_ex,
+            qty,
+            total_ex,
+            item.get('url', ''),
+            price_in,
+        ]
+    
+    def append_to_excel(self, path: str, sheet_name: str, items: list, info: WorkbookInfo = None):
+        """
+        既存Excelに追記
+        シートがあればそのシートのXMLに行を足すだけで、ブック全体は読み込まない
+        （info は事前チェックで読んだブックの構成情報）
+        """
         try:
-            wb.save(path)
+            append_rows(path, sheet_name, [self.item_to_row(item) for item in items], text_columns=(2, 4),
+                        autofit=(10, 50), info=info)
+            return
         except PermissionError:
             raise PermissionError(f'ファイルが他のアプリケーションで開かれています。\nファイルを閉じてから実行してください:\n{path}')
-    
-    def append_to_excel(self, path: str, sheet_name: str, items: list):
-        """既存Excelに追記"""
+        except FileNotFoundError:
+            # ファイルが存在しない場合は新規作成
+            self.write_new_excel(path, sheet_name, items)
+            return
+        except SheetNotFound:
+            pass  # シートを新しく作るときだけブックを読み込む
+        
         try:
             wb = openpyxl.load_workbook(path)
         except PermissionError:
@@ -434,52 +546,20 @@ class UnifiedOrderApp:
             self.write_new_excel(path, sheet_name, items)
             return
         
-        if sheet_name in wb.sheetnames:
-            ws = wb[sheet_name]
-        else:
-            ws = wb.create_sheet(title=sheet_name)
-            headers = ['メーカー', '注文コード', '商品名', '品番/型番', '単価（税別）', '数量', '値段（税別）', 'URL', '税込み']
-            ws.append(headers)
-            header_font = Font(bold=True)
-            header_fill = PatternFill('solid', fgColor='DDDDDD')
-            for col_idx, _ in enumerate(headers, start=1):
-                cell = ws.cell(row=1, column=col_idx)
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.alignment = Alignment(horizontal='center', vertical='center')
+        ws = wb.create_sheet(title=sheet_name)
+        headers = ORDER_HEADERS
+        ws.append(headers)
+        header_font = Font(bold=True)
+        header_fill = PatternFill('solid', fgColor='DDDDDD')
+        for col_idx, _ in enumerate(headers, start=1):
+            cell = ws.cell(row=1, column=col_idx)
+            cell.font = header_font
+            cell.fill = header_fill
+            cell.alignment = Alignment(horizontal='center', vertical='center')
         
         # データ行
         for item in items:
-            price_ex = item.get('price_excl_tax', 0) or 0
-            qty = item.get('quantity', 0) or 0
-            
-            if isinstance(price_ex, str):
-                try:
-                    price_ex = int(price_ex.replace(',', ''))
-                except:
-                    price_ex = 0
-            
-            total_ex = price_ex * qty
-            
-            price_in = item.get('price_incl_tax', 0) or 0
-            if isinstance(price_in, str):
-                try:
-                    price_in = int(price_in.replace(',', ''))
-                except:
-                    price_in = 0
-            
-            row = [
-                item.get('supplier', ''),
-                str(item.get('item_code', '')),
-                item.get('name', ''),
-                str(item.get('model', '')),
-                price_ex,
-                qty,
-                total_ex,
-                item.get('url', ''),
-                price_in,
-            ]
-            ws.append(row)
+            ws.append(self.item_to_row(item))
             
             # 商品コードと型番を文字列として設定
             current_row = ws.max_row
@@ -506,12 +586,8 @@ class UnifiedOrderApp:
             raise PermissionError(f'ファイルが他のアプリケーションで開かれています。\nファイルを閉じてから実行してください:\n{path}')
     
     def autofit_columns(self, ws, max_width=50):
-        """列幅を自動調整（秋月スタイル）"""
-        widths = {}
-        for row in ws.iter_rows(values_only=True):
-            for idx, val in enumerate(row, start=1):
-                length = len(str(val)) if val is not None else 0
-                widths[idx] = max(widths.get(idx, 0), length)
+        """列幅を自動調整（秋月スタイル・全角文字は2文字分として数える）"""
+        widths = measure_widths(ws.iter_rows(values_only=True))
         for idx, w in widths.items():
             ws.column_dimensions[get_column_letter(idx)].width = min(max(w + 2, 10), max_width)
 
@@ -0,0 +1,101 @@
+"""
+保存先Excelの事前チェック
+商品情報の取得（件数によっては数分かかる）を始める前に、保存先に書き込めるかを確かめる。
+Excelで開かれているファイル・ブックとして読めないファイル・作れないシート名はここで止める
+"""
+from typing import Optional, List
+import os
+import zipfile
+import xml.etree.ElementTree as ET
+from xlsx_append import WorkbookInfo, SheetNotFound
+
+MAX_SHEET_NAME_LENGTH = 31
+INVALID_SHEET_CHARS = '[]:*?/\\'
+LOCKED_MESSAGE = 'ファイルが他のアプリケーションで開かれています。\nファイルを閉じてから実行してください:\n{path}'
+
+
+class PreflightError(Exception):
+    """保存先に書き込めない（メッセージはそのまま画面に表示する）"""
+    pass
+
+
+def lock_file_paths(path: str) -> List[str]:
+    """Excelがファイルを開いている間に作る所有者ファイル（~$ファイル名）の候補"""
+    folder, name = os.path.split(os.path.abspath(path))
+    names = ['~$' + name]
+    if len(os.path.splitext(name)[0]) > 6:
+        names.append('~$' + name[2:])  # 長いファイル名では先頭2文字が ~$ に置き換えられることがある
+    return [os.path.join(folder, n) for n in names]
+
+
+def check_sheet_name(sheet_name: str, existing: Optional[List[str]] = None):
+    """Excelで作れるシート名か（existing には既存のシート名。大文字小文字は区別されない）"""
+    if not sheet_name:
+        raise PreflightError('シート名を入力してください。')
+    if len(sheet_name) > MAX_SHEET_NAME_LENGTH:
+        raise PreflightError(f'シート名は{MAX_SHEET_NAME_LENGTH}文字以内にしてください:\n{sheet_name}')
+    bad = [ch for ch in INVALID_SHEET_CHARS if ch in sheet_name]
+    if bad or sheet_name.startswith("'") or sheet_name.endswith("'"):
+        shown = ' '.join(bad) or "'"
+        raise PreflightError(f'シート名に使えない文字が含まれています（{shown}）:\n{sheet_name}')
+    if existing and sheet_name.lower() in (name.lower() for name in existing):
+        raise PreflightError(f'大文字・小文字だけが違う同名のシートがあるため作成できません:\n{sheet_name}')
+
+
+def check_writable(path: str):
+    """ファイル（なければ保存先フォルダ）に書き込めるか。Excelで開かれていれば PreflightError"""
+    for lock in lock_file_paths(path):
+        if os.path.exists(lock):
+            raise PreflightError(LOCKED_MESSAGE.format(path=path)
+                                 + '\n\n（Excelを閉じても表示される場合は、同じフォルダの次のファイルを削除してください:\n'
+                                 + f'{os.path.basename(lock)}）')
+    
+    if os.path.exists(path):
+        if os.path.isdir(path):
+            raise PreflightError(f'保存先がフォルダになっています:\n{path}')
+        try:
+            # Windows では Excel が開いているファイルは書き込みモードで開けない
+            with open(path, 'r+b'):
+                pass
+        except PermissionError:
+            raise PreflightError(LOCKED_MESSAGE.format(path=path))
+        except OSError as e:
+            raise PreflightError(f'ファイルに書き込めません:\n{path}\n{e}')
+        return
+    
+    folder = os.path.dirname(os.path.abspath(path))
+    if not os.path.isdir(folder):
+        raise PreflightError(f'保存先のフォルダがありません:\n{folder}')
+    if not os.access(folder, os.W_OK):
+        raise PreflightError(f'保存先のフォルダに書き込めません:\n{folder}')
+
+
+def check_new_output(path: str, sheet_name: str):
+    """新規作成する保存先のチェック"""
+    check_sheet_name(sheet_name)
+    check_writable(path)
+
+
+def check_append_output(path: str, sheet_name: str) -> Optional[WorkbookInfo]:
+    """
+    追記先のチェック
+    ブックの構成情報を返す（追記でそのまま使う）。ファイルがなければ新規作成になるので None
+    """
+    if not os.path.exists(path):
+        check_new_output(path, sheet_name)
+        return None
+    
+    check_writable(path)
+    try:
+        info = WorkbookInfo(path)
+        if sheet_name in info.sheet_parts:
+            info.dimensions(sheet_name)
+        else:
+            check_sheet_name(sheet_name, info.sheet_names)
+    except PreflightError:
+        raise
+    except PermissionError:
+        raise PreflightError(LOCKED_MESSAGE.format(path=path))
+    except (zipfile.BadZipFile, KeyError, ET.ParseError, SheetNotFound, ValueError) as e:
+        raise PreflightError(f'Excelブック（.xlsx）として読み込めません:\n{path}\n{e}')
+    return info
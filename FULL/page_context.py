@@ -0,0 +1,71 @@
+"""
+1ページ分の解析コンテキスト
+全文テキスト・dt/dd と th/td のラベル対応・タイトル・JSON-LD を初回参照時に1回だけ計算し、
+各抽出処理で使い回す
+"""
+from functools import cached_property
+from typing import List, Tuple, Optional, Any
+import json
+from bs4 import BeautifulSoup
+
+
+class PageContext:
+    """ページ単位で派生データをキャッシュする"""
+    
+    def __init__(self, soup: BeautifulSoup, url: str = ''):
+        self.soup = soup
+        self.url = url
+    
+    @cached_property
+    def text(self) -> str:
+        """改行区切り・空白除去済みの全文テキスト"""
+        return self.soup.get_text('\n', strip=True)
+    
+    @cached_property
+    def raw_text(self) -> str:
+        """区切りなしの全文テキスト（soup.get_text() 相当）"""
+        return self.soup.get_text()
+    
+    @cached_property
+    def labels(self) -> List[Tuple[str, str]]:
+        """dt→dd / th→td の (ラベル, 値) を文書順に並べたもの（値がなければ空文字）"""
+        pairs = []
+        for el in self.soup.select('dt, th'):
+            label = el.get_text(strip=True)
+            sib = el.find_next_sibling('dd' if el.name == 'dt' else 'td')
+            value = sib.get_text(strip=True) if sib else ''
+            pairs.append((label, value))
+        return pairs
+    
+    def find_label_value(self, *keywords: str) -> Optional[str]:
+        """キーワードを含む最初のラベルの値（値が空のものは飛ばす）"""
+        for label, value in self.labels:
+            if value and any(k in label for k in keywords):
+                return value
+        return None
+    
+    @cached_property
+    def title(self) -> Optional[str]:
+        """<title> のテキスト（なければ None）"""
+        tag = self.soup.find('title')
+        if tag is None:
+            return None
+        return tag.get_text()
+    
+    @cached_property
+    def jsonld(self) -> List[Any]:
+        """JSON-LDブロック（解析できたもののみ、リストは展開済み）"""
+        blocks = []
+        for sc in self.soup.find_all('script', {'type': 'application/ld+json'}):
+            content = sc.string or sc.get_text()
+            if not content:
+                continue
+            try:
+                data = json.loads(content)
+            except Exception:
+                continue
+            if isinstance(data, list):
+                blocks.extend(data)
+            else:
+                blocks.append(data)
+        return blocks
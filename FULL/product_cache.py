@@ -0,0 +1,90 @@
+"""
+取得済み商品情報のキャッシュ（SQLite）
+fetch_product_data の結果を正規化URLと商品コードの両方で引けるように保存し、
+有効期限（サイトごと）内であれば通信とHTML解析を省略する
+"""
+from typing import Optional, Dict, Any
+import json
+import os
+import sqlite3
+import threading
+import time
+from app_paths import get_app_data_dir
+
+
+class ProductCache:
+    """商品情報キャッシュ"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS products ('
+            ' url_key TEXT PRIMARY KEY,'
+            ' site TEXT NOT NULL,'
+            ' item_code TEXT,'
+            ' url_code TEXT,'
+            ' data TEXT NOT NULL,'
+            ' fetched_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_products_code ON products(site, item_code)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_products_url_code ON products(site, url_code)')
+        self._conn.commit()
+    
+    def get(self, site: str, url_key: str, code: Optional[str], ttl: float) -> Optional[Dict[str, Any]]:
+        """
+        有効期限内の商品情報を返す
+        
+        Args:
+            site: サイト名
+            url_key: 正規化済みURL
+            code: URLから求めた商品コード（なければ None）
+            ttl: 有効期限（秒）
+        """
+        since = time.time() - ttl
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT data FROM products WHERE url_key = ? AND fetched_at >= ?',
+                (url_key, since)
+            ).fetchone()
+            if row is None and code:
+                row = self._conn.execute(
+                    'SELECT data FROM products WHERE site = ? AND (item_code = ? OR url_code = ?) AND fetched_at >= ?'
+                    ' ORDER BY fetched_at DESC LIMIT 1',
+                    (site, code, code, since)
+                ).fetchone()
+        if row is None:
+            return None
+        try:
+            return json.loads(row[0])
+        except Exception:
+            return None
+    
+    def put(self, site: str, url_key: str, code: Optional[str], product: Dict[str, Any]):
+        """商品情報を保存"""
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO products (url_key, site, item_code, url_code, data, fetched_at)'
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                (url_key, site, str(product.get('item_code') or '') or None, code,
+                 json.dumps(product, ensure_ascii=False), time.time())
+            )
+            self._conn.commit()
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_product_cache() -> Optional[ProductCache]:
+    """全スクレイパー共有のキャッシュを返す（作成できない場合は None）"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            try:
+                _shared_cache = ProductCache(os.path.join(get_app_data_dir(), 'products.sqlite3'))
+            except Exception as e:
+                print(f'商品キャッシュを開けません: {e}')
+                return None
+        return _shared_cache
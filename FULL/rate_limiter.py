@@ -0,0 +1,83 @@
+"""
+ホスト単位のリクエスト間隔制御（トークンバケット）
+全スクレイパーで共有し、サイトごとに決められたレートを超えないようにする
+"""
+from typing import Dict
+from urllib.parse import urlparse
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """トークンバケット（予約方式）"""
+    
+    def __init__(self, rate: float, burst: int = 1, jitter: float = 0.0):
+        self.rate = float(rate)              # 1秒あたりのトークン補充数
+        self.capacity = max(1, int(burst))   # バケット容量（連続で送れる数）
+        self.jitter = max(0.0, jitter)       # 待つときに足すランダムな時間の上限（秒）
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def update(self, rate: float, burst: int = 1, jitter: float = 0.0):
+        """レートを変更する（予約済みの待ち時間は引き継ぐ）"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = float(rate)
+            self.capacity = max(1, int(burst))
+            self.jitter = max(0.0, jitter)
+            self.tokens = min(self.capacity, self.tokens)
+    
+    def reserve(self) -> float:
+        """トークンを1つ予約し、使用可能になるまでの待ち時間（秒）を返す"""
+        with self._lock:
+            self._refill(time.monotonic())
+            # 不足分は前借りし、後続の予約はその分だけ後ろにずれる
+            self.tokens -= 1.0
+            if self.tokens >= 0:
+                return 0.0
+            # 待つときだけ間隔を 1/rate 〜 1/rate + jitter に散らす（後続の予約もその分ずれる）
+            if self.jitter:
+                self.tokens -= random.uniform(0.0, self.jitter) * self.rate
+            return -self.tokens / self.rate
+    
+    def acquire(self):
+        """トークンを取得できるまで待機"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+
+class HostScheduler:
+    """ホスト名ごとのトークンバケットを管理する"""
+    
+    def __init__(self):
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+    
+    def configure(self, host: str, rate: float, burst: int = 1, jitter: float = 0.0):
+        """ホストのレートを設定（既に設定済みならレートだけ変え、予約済みの待ち時間は引き継ぐ）"""
+        host = host.lower()
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                self._buckets[host] = TokenBucket(rate, burst, jitter)
+                return
+        bucket.update(rate, burst, jitter)
+    
+    def acquire(self, url: str):
+        """URLのホストに対してリクエスト可能になるまで待機"""
+        host = (urlparse(url).hostname or '').lower()
+        with self._lock:
+            bucket = self._buckets.get(host)
+        if bucket is not None:
+            bucket.acquire()
+
+
+# 全スクレイパー共有のスケジューラ
+host_scheduler = HostScheduler()
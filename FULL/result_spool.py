@@ -0,0 +1,64 @@
+"""
+取得結果の一時保存（スプール）
+取得が終わった時点で商品情報と保存先をJSONに書いておき、Excelへの保存に成功したら消す。
+保存に失敗しても取得し直さずに保存だけをやり直せる（アプリを閉じても次回起動時に保存できる）
+"""
+from typing import Optional, List, Dict, Any
+import glob
+import json
+import os
+import time
+import uuid
+from app_paths import get_app_data_dir
+
+SPOOL_DIR_NAME = 'spool'
+
+
+def get_spool_dir() -> str:
+    path = os.path.join(get_app_data_dir(), SPOOL_DIR_NAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def save_spool(mode: str, path: str, sheet_name: str, items: List[Dict[str, Any]]) -> str:
+    """取得結果を保存してスプールファイルのパスを返す"""
+    data = {
+        'mode': mode,
+        'path': path,
+        'sheet_name': sheet_name,
+        'items': items,
+        'created_at': time.time(),
+    }
+    spool_path = os.path.join(get_spool_dir(), f'{time.strftime("%Y%m%d-%H%M%S")}-{uuid.uuid4().hex[:8]}.json')
+    tmp = spool_path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, spool_path)
+    return spool_path
+
+
+def load_spool(spool_path: str) -> Optional[Dict[str, Any]]:
+    """スプールファイルを読む（壊れていれば None）"""
+    try:
+        with open(spool_path, encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or not isinstance(data.get('items'), list):
+        return None
+    return data
+
+
+def remove_spool(spool_path: Optional[str]):
+    """保存できたスプールファイルを消す"""
+    if not spool_path:
+        return
+    try:
+        os.remove(spool_path)
+    except OSError:
+        pass
+
+
+def pending_spools() -> List[str]:
+    """保存されずに残っているスプールファイル（古い順）"""
+    return sorted(glob.glob(os.path.join(get_spool_dir(), '*.json')))
@@ -0,0 +1,111 @@
+"""
+リトライ・バックオフ方針
+サイトごとに1つの RetryPolicy を持ち、全取得処理で共通の判定と待ち方を使う。
+待ち時間は decorrelated jitter（前回の待ちの3倍までの乱数）で、Retry-After があればそれに従う。
+1件あたり・1回の実行あたりの待ち時間の合計に上限を設ける
+"""
+from email.utils import parsedate_to_datetime
+from typing import Optional, Iterable
+import random
+import threading
+import time
+import requests
+
+OK = 'ok'        # 成功
+RETRY = 'retry'  # 待って再試行する
+FAIL = 'fail'    # 再試行しても無駄（すぐ失敗にする）
+
+
+class RetryState:
+    """1件分のリトライ状態（RetryPolicy.begin() で作る）"""
+    
+    def __init__(self, policy: 'RetryPolicy'):
+        self.policy = policy
+        self.attempt = 1          # 実行済みの試行回数
+        self.waited = 0.0         # この件で待った合計（秒）
+        self._prev_delay = policy.base_delay
+    
+    def wait(self, response: Optional[requests.Response] = None) -> bool:
+        """
+        次の試行まで待つ。試行回数・待ち時間の上限に達していれば待たずに False
+        
+        Args:
+            response: 直前のレスポンス（Retry-After を見る）
+        """
+        policy = self.policy
+        if self.attempt >= policy.max_attempts:
+            return False
+        
+        delay = policy.retry_after(response) if response is not None else None
+        if delay is None:
+            # decorrelated jitter: base〜前回の3倍 の一様乱数（上限 max_delay）
+            delay = min(policy.max_delay, random.uniform(policy.base_delay, self._prev_delay * 3))
+            self._prev_delay = max(policy.base_delay, delay)
+        if self.waited + delay > policy.item_budget:
+            return False
+        if not policy.take_run_budget(delay):
+            return False
+        
+        time.sleep(delay)
+        self.waited += delay
+        self.attempt += 1
+        return True
+
+
+class RetryPolicy:
+    """サイトごとのリトライ方針"""
+    
+    def __init__(self, max_attempts: int = 3, base_delay: float = 1.0, max_delay: float = 30.0,
+                 item_budget: float = 60.0, run_budget: float = 600.0,
+                 retry_statuses: Iterable[int] = (429, 500, 502, 503, 504)):
+        self.max_attempts = max(1, int(max_attempts))  # 1件あたりの最大試行回数
+        self.base_delay = base_delay                   # 最小の待ち時間（秒）
+        self.max_delay = max_delay                     # 1回の待ち時間の上限（秒）
+        self.item_budget = item_budget                 # 1件あたりの待ち時間の合計上限（秒）
+        self.run_budget = run_budget                   # 1回の実行あたりの待ち時間の合計上限（秒）
+        self.retry_statuses = frozenset(retry_statuses)
+        self._run_spent = 0.0
+        self._lock = threading.Lock()
+    
+    def begin(self) -> RetryState:
+        """1件分のリトライを開始"""
+        return RetryState(self)
+    
+    def new_run(self):
+        """実行単位の待ち時間の合計をリセット（取得処理の開始時に呼ぶ）"""
+        with self._lock:
+            self._run_spent = 0.0
+    
+    def take_run_budget(self, delay: float) -> bool:
+        """実行単位の残りから delay 秒を使う（足りなければ False）"""
+        with self._lock:
+            if self._run_spent + delay > self.run_budget:
+                return False
+            self._run_spent += delay
+            return True
+    
+    def classify_response(self, response: requests.Response) -> str:
+        """レスポンスを 成功 / 再試行 / 失敗 に分類"""
+        if response.status_code == 200:
+            return OK
+        if response.status_code in self.retry_statuses:
+            return RETRY
+        return FAIL
+    
+    def classify_exception(self, exc: Exception) -> str:
+        """例外を 再試行 / 失敗 に分類（タイムアウト・接続エラーのみ再試行）"""
+        if isinstance(exc, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+            return RETRY
+        return FAIL
+    
+    def retry_after(self, response: requests.Response) -> Optional[float]:
+        """Retry-After ヘッダの待ち時間（秒）。ないか解釈できなければ None"""
+        value = (response.headers.get('Retry-After') or '').strip()
+        if not value:
+            return None
+        if value.isdigit():
+            return float(value)
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
@@ -2,17 +2,32 @@
 秋月電子用スクレイパー
 """
 from typing import Optional, Dict, Any
-import time
 import re
-import json
 from urllib.parse import urlparse
-from bs4 import BeautifulSoup
+from html_parser import make_soup, class_marker, id_marker
+from page_context import PageContext
 from scraper_base import ScraperBase
+from transport import TransportConfig
+from retry_policy import RetryPolicy, FAIL
 
 
 class AkizukiScraper(ScraperBase):
     """秋月電子専用スクレイパー"""
     
+    max_workers = 2
+    rate_per_sec = 1.0
+    burst = 2
+    transport = TransportConfig(pool_maxsize=4, connect_timeout=5.0, read_timeout=20.0)
+    retry_policy = RetryPolicy(max_attempts=3, base_delay=1.0, max_delay=10.0, item_budget=30.0)
+    # 主要な欄がある領域（ここだけ先に解析する）
+    parse_regions = [
+        (class_marker('h1-goods-name', 'h1'), 0),
+        (id_marker('spec_number', 'dd'), 0),
+        (id_marker('spec_goods', 'dd'), 0),
+        (class_marker('block-goods-price--price'), 0),
+        (class_marker('block-goods-price--net-price'), 0),
+    ]
+    
     def get_site_name(self) -> str:
         return "秋月電子通商"
     
@@ -25,27 +40,54 @@ class AkizukiScraper(ScraperBase):
         except Exception:
             return False
     
+    def item_code_from_url(self, url: str):
+        """URL（/catalog/g/g123456/）から商品コードを抽出"""
+        try:
+            path = urlparse(url).path
+            m = re.search(r'/catalog/g/g(\d+)/?', path)
+            if m:
+                return m.group(1)
+        except Exception:
+            pass
+        return None
+    
+    def canonicalize_url(self, url: str) -> str:
+        """商品コードが分かるURLは https://akizukidenshi.com/catalog/g/g{コード}/ にそろえる"""
+        code = self.item_code_from_url(url)
+        if code:
+            return f'https://akizukidenshi.com/catalog/g/g{code}/'
+        return super().canonicalize_url(url)
+    
     def fetch_product_data(self, url: str) -> Optional[Dict[str, Any]]:
         """秋月電子の商品ページから商品情報を取得"""
         html = self._fetch_page(url)
         if not html:
             return None
         
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        # Extract fields
-        name = self._extract_name(soup)
-        model = self._extract_model(soup)
-        item_code = self._extract_item_code(soup, url)
-        price_ex, price_in = self._extract_prices(soup)
+        # Partial parse first: use it only when every primary field is present
+        fields = None
+        partial = self.parse_partial(html)
+        if partial is not None:
+            fields = self._extract_fields(PageContext(partial, url), url, primary_only=True)
+            if any(v is None for v in fields):
+                fields = None
         
-        # Fallback: JSON-LD price/name if missing
-        if (price_ex is None or price_in is None) or not name:
-            jl_name, jl_price = self._extract_jsonld(soup)
-            if not name and jl_name:
-                name = jl_name
-            if price_in is None and jl_price is not None:
-                price_in = jl_price
+        if fields is not None:
+            name, model, item_code, price_ex, price_in = fields
+        else:
+            # 1ページ分の派生データ（全文テキスト・ラベル等）は ctx が1回だけ計算する
+            ctx = PageContext(make_soup(html), url)
+            
+            # Extract fields
+            name, model, item_code, price_ex, price_in = self._extract_fields(ctx, url)
+            
+            # Fallback: JSON-LD price/name if missing
+            if (price_ex is None or price_in is None) or not name:
+                jl_name, jl_price = self._extract_jsonld(ctx)
+                if not name and jl_name:
+                    name = jl_name
+                if price_in is None and jl_price is not None:
+                    price_in = jl_price
         
         # Normalize to int
         price_ex = self._to_int(price_ex)
@@ -70,117 +112,118 @@ class AkizukiScraper(ScraperBase):
             'url': url,
         }
     
-    def _fetch_page(self, url: str, retries: int = 3, timeout: int = 20):
-        """ページを取得"""
-        last_err = None
-        for i in range(retries):
+    def _fetch_page(self, url: str, timeout=None):
+        """ページを取得（再試行は retry_policy に従う）"""
+        timeout = timeout or self.timeout
+        retry = self.retry_policy.begin()
+        while True:
+            r = None
             try:
-                r = self.session.get(url, timeout=timeout)
-                if r.status_code == 200 and 'text/html' in r.headers.get('Content-Type', '').lower():
+                r = self._get_cached(url, timeout=timeout)
+                if r.status_code == 200:
+                    if 'text/html' not in r.headers.get('Content-Type', '').lower():
+                        return None
                     text = r.text
-                    if any(x in text for x in ['アクセスが集中', 'メンテナンス', 'ただいま処理中']):
-                        time.sleep(1.2 + i * 0.5)
-                        continue
-                    return text
-                else:
-                    last_err = f'HTTP {r.status_code}'
+                    if not any(x in text for x in ['アクセスが集中', 'メンテナンス', 'ただいま処理中']):
+                        self._report_ok(url)
+                        return text
+                    # 混雑・メンテナンス画面は待って再試行
+                    self._discard_cached(url)
+                    self._report_blocked(url)
+                elif self.retry_policy.classify_response(r) == FAIL:
+                    print(f'HTTPエラー {r.status_code}: {url}')
+                    return None
             except Exception as e:
-                last_err = str(e)
-            time.sleep(1.0 + i * 0.5)
-        return None
+                if self.retry_policy.classify_exception(e) == FAIL:
+                    print(f'取得エラー: {e}, URL: {url}')
+                    return None
+            if not retry.wait(r):
+                return None
     
-    def _extract_name(self, soup: BeautifulSoup):
+    def _extract_fields(self, ctx: PageContext, url: str, primary_only: bool = False):
+        """(商品名, 型番, 商品コード, 税別価格, 税込価格) を抽出"""
+        name = self._extract_name(ctx, primary_only)
+        model = self._extract_model(ctx, primary_only)
+        item_code = self._extract_item_code(ctx, url, primary_only)
+        price_ex, price_in = self._extract_prices(ctx, primary_only)
+        return name, model, item_code, price_ex, price_in
+    
+    def _extract_name(self, ctx: PageContext, primary_only: bool = False):
         """商品名を抽出"""
         # Priority: h1 product name
-        el = soup.select_one('h1.h1-goods-name')
+        el = ctx.soup.select_one('h1.h1-goods-name')
         if el and el.get_text(strip=True):
             return el.get_text(strip=True)
+        if primary_only:
+            return None
         
-        og = soup.find('meta', property='og:title')
+        og = ctx.soup.find('meta', property='og:title')
         if og and og.get('content'):
             return og['content'].strip()
         
-        if soup.title and soup.title.string:
-            title = soup.title.string.strip()
+        if ctx.title:
+            title = ctx.title.strip()
             title = re.sub(r'\s*[｜|:].*$', '', title)
             return title
         return None
     
-    def _extract_model(self, soup: BeautifulSoup):
+    def _extract_model(self, ctx: PageContext, primary_only: bool = False):
         """型番を抽出"""
         # Direct id
-        dd = soup.select_one('dd#spec_number')
+        dd = ctx.soup.select_one('dd#spec_number')
         if dd and dd.get_text(strip=True):
             return dd.get_text(strip=True)
+        if primary_only:
+            return None
         
         # dt "型番" -> sibling dd
-        for dt in soup.select('dt, th'):
-            label = dt.get_text(strip=True)
-            if '型番' in label or '型式' in label or '品番' in label:
-                sib = None
-                if dt.name == 'dt':
-                    sib = dt.find_next_sibling('dd')
-                else:
-                    sib = dt.find_next_sibling('td')
-                if sib and sib.get_text(strip=True):
-                    return sib.get_text(strip=True)
+        value = ctx.find_label_value('型番', '型式', '品番')
+        if value:
+            return value
         
         # Inline fallback
-        text = soup.get_text('\n', strip=True)
-        m = re.search(r'(?:型番|型式|品番)\s*[:：]\s*([^\s　|｜\n]+)', text)
+        m = re.search(r'(?:型番|型式|品番)\s*[:：]\s*([^\s　|｜\n]+)', ctx.text)
         if m:
             return m.group(1)
         return None
     
-    def _extract_item_code(self, soup: BeautifulSoup, url: str):
+    def _extract_item_code(self, ctx: PageContext, url: str, primary_only: bool = False):
         """商品コードを抽出"""
         # DOM first
-        dd = soup.select_one('dd#spec_goods')
+        dd = ctx.soup.select_one('dd#spec_goods')
         if dd and dd.get_text(strip=True):
             return dd.get_text(strip=True)
+        if primary_only:
+            return None
         
-        for dt in soup.select('dt, th'):
-            if '販売コード' in dt.get_text(strip=True) or '商品コード' in dt.get_text(strip=True):
-                sib = None
-                if dt.name == 'dt':
-                    sib = dt.find_next_sibling('dd')
-                else:
-                    sib = dt.find_next_sibling('td')
-                if sib and sib.get_text(strip=True):
-                    return sib.get_text(strip=True)
+        value = ctx.find_label_value('販売コード', '商品コード')
+        if value:
+            return value
         
         # URL pattern: /catalog/g/g123456/
-        try:
-            path = urlparse(url).path
-            m = re.search(r'/catalog/g/g(\d+)/?', path)
-            if m:
-                return m.group(1)
-        except Exception:
-            pass
-        
-        return None
+        return self.item_code_from_url(url)
     
-    def _extract_prices(self, soup: BeautifulSoup):
+    def _extract_prices(self, ctx: PageContext, primary_only: bool = False):
         """価格を抽出（税別、税込）"""
         price_incl = None
         price_excl = None
         
         # Explicit elements
-        incl_el = soup.select_one('.block-goods-price--price')
+        incl_el = ctx.soup.select_one('.block-goods-price--price')
         if incl_el:
             m = re.search(r'￥\s*([0-9,]+)', incl_el.get_text(' ', strip=True))
             if m:
                 price_incl = self._to_int(m.group(1))
         
-        excl_el = soup.select_one('.block-goods-price--net-price')
+        excl_el = ctx.soup.select_one('.block-goods-price--net-price')
         if excl_el:
             m = re.search(r'￥\s*([0-9,]+)', excl_el.get_text(' ', strip=True))
             if m:
                 price_excl = self._to_int(m.group(1))
         
         # Context scan with 税込/税抜 hints
-        if price_incl is None or price_excl is None:
-            text = soup.get_text('\n', strip=True)
+        if (price_incl is None or price_excl is None) and not primary_only:
+            text = ctx.text
             for m in re.finditer(r'￥\s*([0-9,]+)', text):
                 val = self._to_int(m.group(1))
                 if val is None:
@@ -195,30 +238,17 @@ class AkizukiScraper(ScraperBase):
         
         return price_excl, price_incl
     
-    def _extract_jsonld(self, soup: BeautifulSoup):
+    def _extract_jsonld(self, ctx: PageContext):
         """JSON-LDから商品情報を抽出"""
-        try:
-            for sc in soup.find_all('script', {'type': 'application/ld+json'}):
-                content = sc.string or sc.get_text()
-                if not content:
-                    continue
-                data = json.loads(content)
-                # Handle list or single object
-                if isinstance(data, list):
-                    candidates = data
-                else:
-                    candidates = [data]
-                for obj in candidates:
-                    if isinstance(obj, dict) and obj.get('@type') in ('Product', 'product', 'Offer'):
-                        name = obj.get('name')
-                        price = None
-                        if 'offers' in obj and isinstance(obj['offers'], dict):
-                            price = obj['offers'].get('price')
-                        elif 'price' in obj:
-                            price = obj.get('price')
-                        return (name, self._to_int(price))
-        except Exception:
-            pass
+        for obj in ctx.jsonld:
+            if isinstance(obj, dict) and obj.get('@type') in ('Product', 'product', 'Offer'):
+                name = obj.get('name')
+                price = None
+                if 'offers' in obj and isinstance(obj['offers'], dict):
+                    price = obj['offers'].get('price')
+                elif 'price' in obj:
+                    price = obj.get('price')
+                return (name, self._to_int(price))
         return (None, None)
     
     def _to_int(self, v):
@@ -0,0 +1,398 @@
+"""
+Amazon用スクレイパー
+取得方法を戦略（HttpStrategy / BrowserStrategy）として持ち、HTTPで取れないとき（ボット判定など）だけ
+ブラウザで取り直す。ブラウザは Selenium（undetected-chromedriver）が入っている場合のみ使う
+"""
+from typing import Optional, Dict, Any, List, Tuple
+import queue
+import re
+import threading
+from urllib.parse import urlparse
+from html_parser import make_soup, id_marker
+from page_context import PageContext
+from scraper_base import ScraperBase
+from rate_limiter import host_scheduler
+from circuit_breaker import host_breakers, CircuitOpenError
+from transport import TransportConfig
+from retry_policy import RetryPolicy, OK, RETRY, FAIL
+
+try:
+    import undetected_chromedriver as uc
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.common.exceptions import TimeoutException, WebDriverException
+    SEL_AVAILABLE = True
+except Exception:
+    SEL_AVAILABLE = False
+
+AMAZON_HOST = 'www.amazon.co.jp'
+AMAZON_HOSTS = (AMAZON_HOST, 'amazon.co.jp')  # www なしのURLも受け付ける（正規化で www 付きにそろえる）
+TAX_RATE = 0.10
+# 詳細欄の値に入っている書字方向の制御文字（&lrm; など）。strip() では消えない
+_BIDI_RE = re.compile('[\u200e\u200f\u202a-\u202e\u2066-\u2069]')
+
+PRICE_SELECTORS = [
+    '#corePriceDisplay_desktop_feature_div .a-price .a-offscreen',
+    '#apex_desktop .a-price .a-offscreen',
+    'span.a-price .a-offscreen',
+    '#priceblock_ourprice',
+    '#priceblock_dealprice',
+    '#priceblock_saleprice',
+    'span#sns-base-price',
+    '.apexPriceToPay .a-offscreen',
+]
+DETAIL_TABLE_SELECTORS = [
+    '#productDetails_techSpec_section_1 tr',
+    '#productDetails_detailBullets_sections1 tr',
+    '#productDetails_db_sections tr',
+]
+MODEL_KEYS = ['型番', 'モデル番号', '品番', 'Item model number', 'Manufacturer Part Number', 'メーカー型番']
+
+# 軽量読み込みで遮断するURL（テキストしか使わないので画像・フォント・動画・広告/計測は不要）
+# CAPTCHAの画像も jpg。手動で解く画面がある場合は画像だけ遮断を外すこと（IMAGE_URL_PATTERNS を除く）
+IMAGE_URL_PATTERNS = ['*.jpg', '*.jpeg', '*.png', '*.gif', '*.webp', '*.svg', '*.ico', '*.bmp']
+BLOCKED_URL_PATTERNS = IMAGE_URL_PATTERNS + [
+    '*.woff', '*.woff2', '*.ttf', '*.otf',
+    '*.mp4', '*.webm', '*.m3u8', '*.mp3',
+    '*amazon-adsystem.com*', '*doubleclick.net*', '*google-analytics.com*',
+    '*googletagmanager.com*', '*fls-fe.amazon.co.jp*', '*unagi.amazon.co.jp*',
+]
+
+
+def is_bot_check(html: str, url: str = '') -> bool:
+    """CAPTCHA・ロボット確認ページかどうか"""
+    text = html.lower()
+    return 'validatecaptcha' in url.lower() or 'validatecaptcha' in text or \
+        'captcha' in text or 'robot check' in text
+
+
+def _clean_text(text: str) -> str:
+    """書字方向の制御文字を取り除いて前後の空白を削る"""
+    return _BIDI_RE.sub('', text).strip()
+
+
+class HttpStrategy:
+    """requests で取得する（ScraperBase のキャッシュ・レート制限・ブレーカーを使う）"""
+    
+    name = 'http'
+    
+    def fetch_html(self, scraper: 'AmazonScraper', url: str) -> Optional[str]:
+        retry = scraper.retry_policy.begin()
+        while True:
+            response = None
+            try:
+                response = scraper._get_cached(url, timeout=scraper.timeout)
+                if response.status_code == 200 and is_bot_check(response.text, response.url or url):
+                    # ボット判定ページは保存せず、待って再試行
+                    scraper._discard_cached(url)
+                    scraper._report_blocked(url)
+                    verdict, reason = RETRY, 'ボット判定'
+                else:
+                    verdict, reason = scraper.retry_policy.classify_response(response), f'HTTPエラー {response.status_code}'
+            except Exception as e:
+                verdict, reason = scraper.retry_policy.classify_exception(e), f'エラー: {e}'
+            
+            if verdict == OK:
+                return response.text  # 文字コードは _get_cached で決定済み
+            if verdict == FAIL or not retry.wait(response):
+                print(f'{reason}: {url}')
+                return None
+    
+    def close(self):
+        pass
+
+
+class BrowserStrategy:
+    """
+    ヘッドレスChromeで取得する（HTTPがボット判定されたとき用）
+    ドライバはワーカー数まで起動して使い回し、close() でまとめて終了する
+    """
+    
+    name = 'browser'
+    
+    def __init__(self, max_drivers: int = 1, wait_timeout: float = 20.0):
+        self.max_drivers = max(1, int(max_drivers))
+        self.wait_timeout = wait_timeout
+        self._idle: 'queue.Queue' = queue.Queue()
+        self._drivers: List[Any] = []
+        self._lock = threading.Lock()
+        # undetected_chromedriver は起動時にドライバ実行ファイルを書き換えるため、同時に起動しない
+        self._start_lock = threading.Lock()
+    
+    def fetch_html(self, scraper: 'AmazonScraper', url: str) -> Optional[str]:
+        try:
+            driver = self._acquire()
+        except Exception as e:
+            print(f'ブラウザを起動できません: {e}')
+            return None
+        
+        broken = False
+        try:
+            retry = scraper.retry_policy.begin()
+            while True:
+                try:
+                    host_breakers.wait_ready(url, scraper.breaker_max_wait)
+                    host_scheduler.acquire(url)
+                    driver.get(url)
+                    if is_bot_check(driver.page_source, driver.current_url):
+                        scraper._report_blocked(url)
+                        reason = 'ボット判定（ブラウザ）'
+                    else:
+                        WebDriverWait(driver, self.wait_timeout).until(
+                            EC.presence_of_element_located((By.CSS_SELECTOR, '#productTitle'))
+                        )
+                        return driver.page_source
+                except TimeoutException:
+                    reason = 'タイムアウト（ブラウザ）'
+                except CircuitOpenError as e:
+                    print(f'{e}: {url}')
+                    return None
+                except WebDriverException as e:
+                    broken = True
+                    print(f'ブラウザエラー: {e}, URL: {url}')
+                    return None
+                if not retry.wait():
+                    print(f'{reason}: {url}')
+                    return None
+        finally:
+            self._release(driver, broken)
+    
+    def _acquire(self):
+        """空いているドライバを取り出す（上限までは新しく起動する）"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            start_new = len(self._drivers) < self.max_drivers
+            if start_new:
+                self._drivers.append(None)  # 起動中の枠を確保
+        if not start_new:
+            return self._idle.get()
+        try:
+            driver = self._start_driver()
+        except Exception:
+            with self._lock:
+                self._drivers.remove(None)
+            raise
+        with self._lock:
+            self._drivers[self._drivers.index(None)] = driver
+        return driver
+    
+    def _release(self, driver, broken: bool = False):
+        """ドライバを戻す（壊れていれば終了して枠を空ける）"""
+        if not broken:
+            self._idle.put(driver)
+            return
+        with self._lock:
+            if driver in self._drivers:
+                self._drivers.remove(driver)
+        self._quit(driver)
+    
+    def _start_driver(self):
+        options = uc.ChromeOptions()
+        options.add_argument('--headless=new')
+        options.add_argument('--disable-blink-features=AutomationControlled')
+        options.add_argument('--disable-dev-shm-usage')
+        options.add_argument('--no-sandbox')
+        options.add_argument('--disable-gpu')
+        options.add_argument('--window-size=1200,900')
+        options.page_load_strategy = 'eager'  # DOM構築が終われば次へ進む
+        with self._start_lock:
+            driver = uc.Chrome(options=options, use_subprocess=True)
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URL_PATTERNS})
+        except Exception as e:
+            print('リソース遮断を設定できません:', e)
+        return driver
+    
+    @staticmethod
+    def _quit(driver):
+        try:
+            driver.quit()
+        except Exception:
+            pass
+    
+    def close(self):
+        """起動したドライバをすべて終了"""
+        with self._lock:
+            drivers = [d for d in self._drivers if d is not None]
+            self._drivers = []
+        self._idle = queue.Queue()
+        for driver in drivers:
+            self._quit(driver)
+
+
+class AmazonScraper(ScraperBase):
+    """Amazon.co.jp 専用スクレイパー"""
+    
+    max_workers = 2
+    rate_per_sec = 0.5
+    burst = 1
+    transport = TransportConfig(pool_maxsize=4, connect_timeout=5.0, read_timeout=25.0)
+    breaker_threshold = 3
+    breaker_cooldown = 60.0
+    breaker_max_wait = 900.0
+    retry_policy = RetryPolicy(max_attempts=3, base_delay=2.0, max_delay=30.0, item_budget=90.0)
+    # 主要な欄がある領域（ここだけ先に解析する）
+    parse_regions = [
+        (id_marker('productTitle', 'span'), 0),
+        (id_marker('corePriceDisplay_desktop_feature_div', 'div'), 0),
+        (id_marker('apex_desktop', 'div'), 0),
+        (id_marker('productDetails_techSpec_section_1', 'table'), 0),
+        (id_marker('productDetails_detailBullets_sections1', 'table'), 0),
+        (id_marker('detailBullets_feature_div', 'div'), 0),
+    ]
+    
+    def __init__(self):
+        super().__init__()
+        self.session.headers['Referer'] = f'https://{AMAZON_HOST}/'
+        # 前から順に試す取得方法（ブラウザは Selenium がある場合のみ）
+        self.strategies = [HttpStrategy()]
+        if SEL_AVAILABLE:
+            self.strategies.append(BrowserStrategy(max_drivers=self.max_workers))
+    
+    def get_site_name(self) -> str:
+        return "Amazon"
+    
+    def is_valid_url(self, url: str) -> bool:
+        """Amazon.co.jp の商品URLかどうか判定"""
+        try:
+            p = urlparse(url)
+        except Exception:
+            return False
+        if (p.hostname or '').lower() not in AMAZON_HOSTS:
+            return False
+        return '/dp/' in p.path or '/gp/product/' in p.path
+    
+    def item_code_from_url(self, url: str):
+        """URL（/dp/ASIN または /gp/product/ASIN）からASINを抽出"""
+        m = re.search(r'/(?:dp|gp/product)/([A-Z0-9]{10})', url)
+        if m:
+            return m.group(1)
+        return None
+    
+    def canonicalize_url(self, url: str) -> str:
+        """ASINが分かるURLは https://www.amazon.co.jp/dp/{ASIN} にそろえる"""
+        asin = self.item_code_from_url(url)
+        if asin:
+            return f'https://{AMAZON_HOST}/dp/{asin}'
+        return super().canonicalize_url(url)
+    
+    def fetch_product_data(self, url: str) -> Optional[Dict[str, Any]]:
+        """HTTP → ブラウザ の順に取得し、最初に商品情報が取れたものを返す"""
+        # www なしのURLも www 付きで取得する（待ち間隔・遮断判定をホストごとに分けない）
+        fetch_url = self.canonicalize_url(url)
+        for strategy in self.strategies:
+            html = strategy.fetch_html(self, fetch_url)
+            if not html:
+                continue
+            record = self._parse(html, url)
+            if record is not None:
+                self._report_ok(fetch_url)
+                if strategy.name != 'http':
+                    print(f'{strategy.name} で取得: {url}')
+                return record
+            if strategy.name == 'http':
+                self._discard_cached(fetch_url)
+        return None
+    
+    def close(self):
+        for strategy in self.strategies:
+            strategy.close()
+    
+    def _parse(self, html: str, url: str) -> Optional[Dict[str, Any]]:
+        """商品ページのHTMLから商品情報を作る（取れなければ None）"""
+        # 主要な領域だけで商品名・価格が取れればそれを使う
+        fields = None
+        partial = self.parse_partial(html)
+        if partial is not None:
+            fields = self._extract_fields(PageContext(partial, url), primary_only=True)
+            if not (fields[0] and fields[3]):
+                fields = None
+        if fields is None:
+            fields = self._extract_fields(PageContext(make_soup(html), url))
+        name, model, asin, price_in = fields
+        
+        # ASINはURLから必ず分かるので判定に使わない（CAPTCHA・ブロック画面は商品名か価格が欠ける）
+        if not name or not price_in:
+            return None
+        asin = self.item_code_from_url(url) or asin
+        price_ex = int(round(price_in / (1 + TAX_RATE))) if price_in else 0
+        
+        return {
+            'supplier': 'Amazon',
+            'item_code': asin or '',
+            'name': name or '',
+            'model': model or '',
+            'price_excl_tax': price_ex,
+            'price_incl_tax': price_in,
+            'url': url,
+        }
+    
+    def _extract_fields(self, ctx: PageContext, primary_only: bool = False) -> Tuple[str, str, str, int]:
+        """(商品名, 型番, ASIN, 税込価格) を抽出"""
+        name = self._extract_name(ctx, primary_only)
+        model, asin = self._extract_model_and_asin(ctx)
+        price = self._extract_price(ctx, primary_only)
+        return name, model, asin, price
+    
+    def _extract_name(self, ctx: PageContext, primary_only: bool = False) -> str:
+        """商品名を抽出（#productTitle のみ。ページタイトルはブロック画面でも入っているので使わない）"""
+        el = ctx.soup.select_one('#productTitle')
+        if el and el.get_text(strip=True):
+            return el.get_text(strip=True)
+        return ''
+    
+    def is_complete(self, product: Dict[str, Any]) -> bool:
+        """商品名と価格がそろっていればキャッシュしてよい"""
+        return bool(product.get('name')) and bool(product.get('price_incl_tax'))
+    
+    def _extract_model_and_asin(self, ctx: PageContext) -> Tuple[str, str]:
+        """詳細テーブル・詳細箇条書きから (型番, ASIN) を抽出"""
+        rows = []
+        for sel in DETAIL_TABLE_SELECTORS:
+            for tr in ctx.soup.select(sel):
+                th = tr.find('th')
+                td = tr.find('td')
+                if th and td:
+                    rows.append((_clean_text(th.get_text(strip=True)), _clean_text(td.get_text(strip=True))))
+        for li in ctx.soup.select('#detailBullets_feature_div li'):
+            bold = li.find('span', class_='a-text-bold')
+            if not bold:
+                continue
+            label = _clean_text(bold.get_text(strip=True)).rstrip(':：')
+            vals = [_clean_text(span.get_text(' ', strip=True)) for span in li.find_all('span') if span is not bold]
+            rows.append((label, ' '.join(v for v in vals if v)))
+        
+        model = ''
+        asin = ''
+        for label, value in rows:
+            if not label or not value:
+                continue
+            if 'ASIN' in label:
+                asin = asin or value.strip()
+            elif any(k in label for k in MODEL_KEYS):
+                model = model or value.strip()
+        return model, asin
+    
+    def _extract_price(self, ctx: PageContext, primary_only: bool = False) -> int:
+        """税込価格を抽出（見つからなければ 0）"""
+        for sel in PRICE_SELECTORS:
+            for el in ctx.soup.select(sel):
+                price = self._to_int(el.get_text())
+                if price:
+                    return price
+        if primary_only:
+            return 0
+        m = re.search(r'[¥￥]\s?([\d,]+)', ctx.raw_text)
+        if m:
+            return self._to_int(m.group(1))
+        return 0
+    
+    def _to_int(self, v) -> int:
+        """数字だけを取り出してintに変換（なければ 0）"""
+        s = re.sub(r'[^\d]', '', str(v or ''))
+        return int(s) if s else 0
@@ -3,16 +3,39 @@
 各サイト用のスクレイパーはこのクラスを継承して実装する
 """
 from abc import ABC, abstractmethod
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
+from urllib.parse import urlparse, urlunparse
 import requests
+from bs4 import BeautifulSoup
+from html_parser import make_soup, slice_regions
+from rate_limiter import host_scheduler
+from circuit_breaker import host_breakers
+from http_cache import ResponseCache, get_response_cache
+from product_cache import get_product_cache
+from transport import TransportConfig, build_session
+from text_encoding import resolve_encoding
+from retry_policy import RetryPolicy
 
 
 class ScraperBase(ABC):
     """スクレイパー基底クラス"""
     
+    # 並列取得の設定（サイトごとにサブクラスで上書きする）
+    max_workers: int = 2          # 同時に取得するワーカー数
+    rate_per_sec: float = 1.0     # ホストへの平均リクエスト数（回/秒）
+    burst: int = 1                # 連続で送ってよいリクエスト数
+    use_response_cache: bool = True  # HTTPレスポンスキャッシュを使うか
+    product_ttl: float = 24 * 3600   # 商品情報キャッシュの有効期限（秒）。0で無効
+    transport: TransportConfig = TransportConfig()  # 接続プール・タイムアウト・通信リトライ
+    breaker_threshold: int = 3       # 連続何回ブロック・メンテナンスを検出したらホストを止めるか
+    breaker_cooldown: float = 30.0   # 止めてからプローブを送るまでの時間（秒）
+    breaker_max_wait: float = 600.0  # 止まったホストの再開を待つ上限（秒）
+    retry_policy: RetryPolicy = RetryPolicy()  # 再試行の判定・待ち方（サイトごとに上書きする）
+    # 部分解析する領域: (開始タグにマッチする正規表現, 何階層上の要素を取るか)
+    parse_regions: List[Tuple[str, int]] = []
+    
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.session = build_session(self.transport, {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'ja-JP,ja;q=0.9,en;q=0.8',
@@ -20,6 +43,108 @@ class ScraperBase(ABC):
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1'
         })
+        self.timeout = self.transport.timeout  # (接続, 読み込み)
+        self.response_cache = get_response_cache() if self.use_response_cache else None
+        self.product_cache = get_product_cache() if self.product_ttl > 0 else None
+    
+    def get_product(self, url: str, force_refresh: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        商品情報を取得（有効期限内のキャッシュがあれば通信・解析を省略）
+        
+        Args:
+            force_refresh: True ならキャッシュを使わず取得し直す
+        """
+        key = self.canonicalize_url(url)
+        code = self.item_code_from_url(url)
+        if self.product_cache is not None and not force_refresh:
+            cached = self.product_cache.get(self.get_site_name(), key, code, self.product_ttl)
+            if cached and self.is_complete(cached):
+                cached['url'] = url
+                return cached
+        
+        product = self.fetch_product_data(url)
+        if product and self.product_cache is not None and self.is_complete(product):
+            self.product_cache.put(self.get_site_name(), key, code, product)
+        return product
+    
+    def is_complete(self, product: Dict[str, Any]) -> bool:
+        """キャッシュしてよい商品情報か（欠けた情報を有効期限いっぱい使い回さないよう、サイトごとに上書きする）"""
+        return True
+    
+    def _get(self, url: str, **kwargs) -> requests.Response:
+        """
+        ホストごとのレート制限に従ってGETする
+        ホストが停止中（サーキットブレーカー作動中）なら再開まで待つ
+        """
+        host = (urlparse(url).hostname or '').lower()
+        host_scheduler.configure(host, self.rate_per_sec, self.burst)
+        host_breakers.configure(host, self.breaker_threshold, self.breaker_cooldown)
+        host_breakers.wait_ready(url, self.breaker_max_wait)
+        host_scheduler.acquire(url)
+        response = self.session.get(url, **kwargs)
+        if response.status_code in (429, 503):
+            host_breakers.record_block(url)
+        return response
+    
+    def _get_cached(self, url: str, **kwargs) -> requests.Response:
+        """
+        キャッシュ付きGET
+        キャッシュがあれば条件付きGETで再検証し、304なら保存済みの本文を200として返す。
+        200のレスポンスには resolve_encoding で決めた文字コードを設定済み
+        """
+        if self.response_cache is None:
+            response = self._get(url, **kwargs)
+        else:
+            key = self.canonicalize_url(url)
+            entry = self.response_cache.get(key)
+            headers = dict(kwargs.pop('headers', None) or {})
+            if entry:
+                headers.update(ResponseCache.conditional_headers(entry))
+            
+            response = self._get(url, headers=headers, **kwargs)
+            if response.status_code == 304 and entry:
+                response = ResponseCache.to_response(entry, url)
+            elif response.status_code == 200:
+                self.response_cache.put(key, response)
+        
+        if response.status_code == 200:
+            response.encoding = resolve_encoding(response)
+        return response
+    
+    def _report_blocked(self, url: str):
+        """ボット対策・メンテナンス画面を検出したことをブレーカーに知らせる"""
+        host_breakers.record_block(url)
+    
+    def _report_ok(self, url: str):
+        """正常なページが取れたことをブレーカーに知らせる（停止中なら再開）"""
+        host_breakers.record_success(url)
+    
+    def close(self):
+        """取得が終わったときに呼ばれる（ブラウザなどを使うサブクラスで解放処理を実装）"""
+        pass
+    
+    def _discard_cached(self, url: str):
+        """キャッシュ済みレスポンスを破棄（メンテナンス画面などを保存してしまった場合）"""
+        if self.response_cache is not None:
+            self.response_cache.discard(self.canonicalize_url(url))
+    
+    def parse_partial(self, html: str) -> Optional[BeautifulSoup]:
+        """parse_regions の要素だけを解析する（領域が見つからなければ None）"""
+        if not self.parse_regions or not html:
+            return None
+        snippet = slice_regions(html, self.parse_regions)
+        if snippet is None:
+            return None
+        return make_soup(snippet)
+    
+    def item_code_from_url(self, url: str) -> Optional[str]:
+        """URLから商品コードが分かる場合は返す（サブクラスで実装）"""
+        return None
+    
+    def canonicalize_url(self, url: str) -> str:
+        """キャッシュキー・重複判定用にURLを正規化（サイトごとに上書きする）"""
+        p = urlparse(url.strip())
+        return urlunparse((p.scheme.lower(), p.netloc.lower(), p.path or '/', p.params, p.query, ''))
     
     @abstractmethod
     def get_site_name(self) -> str:
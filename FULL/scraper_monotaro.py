@@ -2,16 +2,31 @@
 モノタロウ用スクレイパー
 """
 from typing import Optional, Dict, Any
-import time
 import re
-from bs4 import BeautifulSoup
-import requests
+from html_parser import make_soup, class_marker
+from page_context import PageContext
 from scraper_base import ScraperBase
+from transport import TransportConfig
+from retry_policy import RetryPolicy, OK, RETRY, FAIL
 
 
 class MonotaroScraper(ScraperBase):
     """モノタロウ専用スクレイパー"""
     
+    max_workers = 4
+    rate_per_sec = 5.0
+    burst = 3
+    transport = TransportConfig(pool_maxsize=8, connect_timeout=5.0, read_timeout=15.0)
+    retry_policy = RetryPolicy(max_attempts=3, base_delay=1.0, max_delay=10.0, item_budget=30.0)
+    # 主要な欄がある領域（ここだけ先に解析する）
+    parse_regions = [
+        (r'<h1\b', 0),
+        (class_marker('AttributeLabelItem', 'span'), 0),
+        (class_marker('SellingPrice__Title'), 0),
+        (class_marker('Price--Lg', 'span'), 0),
+        (class_marker('ReferencePrice__Title', 'span'), 1),  # 親要素に価格がある
+    ]
+    
     def get_site_name(self) -> str:
         return "モノタロウ"
     
@@ -19,60 +34,71 @@ class MonotaroScraper(ScraperBase):
         """モノタロウのURLかどうか判定"""
         return url.startswith('https://www.monotaro.com')
     
+    def item_code_from_url(self, url: str):
+        """URL（/p/1234/5678/）から商品コードを抽出"""
+        matched = re.search(r'/p/(\d+)/(\d+)', url)
+        if matched:
+            return matched.group(1) + matched.group(2)
+        return None
+    
+    def canonicalize_url(self, url: str) -> str:
+        """商品URLは https://www.monotaro.com/p/{前半}/{後半}/ にそろえる（クエリ等を除去）"""
+        matched = re.search(r'/p/(\d+)/(\d+)', url)
+        if matched:
+            return f'https://www.monotaro.com/p/{matched.group(1)}/{matched.group(2)}/'
+        return super().canonicalize_url(url)
+    
     def fetch_product_data(self, url: str) -> Optional[Dict[str, Any]]:
         """モノタロウの商品ページから商品情報を取得"""
         try:
-            # リトライロジック
-            response = None
-            for attempt in range(3):
+            # リトライロジック（判定と待ち方は retry_policy に従う）
+            retry = self.retry_policy.begin()
+            while True:
+                response = None
                 try:
-                    response = self.session.get(url, timeout=15)
+                    response = self._get_cached(url, timeout=self.timeout)
                     # ステータスコード確認
                     if response.status_code == 403 or 'ログイン' in response.text:
-                        # ボット対策またはログイン要求
-                        if attempt < 2:
-                            time.sleep(2)  # 待機してリトライ
-                            continue
-                        else:
-                            print(f'ログイン要求またはボット対策: {url}')
-                            return None
-                    if response.status_code != 200:
-                        print(f'HTTPエラー {response.status_code}: {url}')
-                        return None
+                        # ボット対策またはログイン要求: 待機してリトライ
+                        self._discard_cached(url)
+                        if response.status_code == 403:
+                            self._report_blocked(url)
+                        verdict, reason = RETRY, 'ログイン要求またはボット対策'
+                    else:
+                        verdict, reason = self.retry_policy.classify_response(response), f'HTTPエラー {response.status_code}'
+                except Exception as e:
+                    verdict, reason = self.retry_policy.classify_exception(e), f'エラー: {e}'
+                
+                if verdict == OK:
+                    self._report_ok(url)
                     break
-                except requests.exceptions.Timeout:
-                    if attempt < 2:
-                        time.sleep(2)
-                        continue
-                    raise
-            
-            if response is None:
-                print(f'HTTPレスポンスが取得できませんでした: {url}')
-                return None
-            
-            # エンコーディング自動検出
-            response.encoding = response.apparent_encoding or 'utf-8'
-            soup = BeautifulSoup(response.content, 'html.parser')
+                if verdict == FAIL or not retry.wait(response):
+                    print(f'{reason}: {url}')
+                    return None
             
             # URLからコード抽出
-            matched = re.search(r'/p/(\d+)/(\d+)', url)
-            item_code = None
-            if matched:
-                item_code = matched.group(1) + matched.group(2)
+            item_code = self.item_code_from_url(url)
             
-            # ============ 商品名取得 ============
-            product_name = ''
+            # 主要な欄がある領域だけを先に解析し、すべて取れればそれを使う
+            html = response.text  # 文字コードは _get_cached で決定済み
+            partial = self.parse_partial(html)
+            if partial is not None:
+                primary = self._extract_primary(PageContext(partial, url))
+                if primary is not None:
+                    return self._make_record(url, item_code, *primary)
+            
+            soup = make_soup(response.content, from_encoding=response.encoding)
+            # タイトル・全文テキスト等は ctx が1回だけ計算して使い回す
+            ctx = PageContext(soup, url)
             
+            # ============ 商品名取得 ============
             # h1タグから取得（メイン商品名）
-            h1_tag = soup.select_one('h1')
-            if h1_tag:
-                product_name = h1_tag.get_text(strip=True)
+            product_name = self._name_from_h1(ctx)
             
             # h1が見つからない場合は別の方法
             if not product_name:
-                title_tag = soup.select_one('title')
-                if title_tag:
-                    title_text = title_tag.get_text()
+                title_text = ctx.title
+                if title_text:
                     # タイトルから最初の部分を抽出（"商品名 | モノタロウ"形式）
                     if '|' in title_text:
                         product_name = title_text.split('|')[0].strip()
@@ -84,24 +110,13 @@ class MonotaroScraper(ScraperBase):
                 return None
             
             # ============ 型番取得 ============
-            model_number = ''
-            
             # 方法1: span.AttributeLabelItem から取得（品番M2.5×16 形式）
-            attr_labels = soup.select('span.AttributeLabelItem')
-            for attr_label in attr_labels:
-                text = attr_label.get_text(strip=True)
-                # "品番M2.5×16" から "M2.5×16" を抽出
-                if '品番' in text:
-                    match = re.search(r'品番(.+)', text)
-                    if match:
-                        model_number = match.group(1).strip()
-                        break
+            model_number = self._model_from_attr_labels(ctx)
             
             # 方法2: タイトルから型番を抽出（M2.5×16 商品名... 形式）
             if not model_number:
-                title_tag = soup.select_one('title')
-                if title_tag:
-                    title_text = title_tag.get_text(strip=True)
+                if ctx.title:
+                    title_text = ctx.title.strip()
                     # パターン: 型番が先頭にある（M2.5×16のような形式）
                     # 数字、アルファベット、×、-、.などを含む可能性
                     match = re.match(r'^([A-Z0-9\.\-]+[×x][A-Z0-9\.\-]+)\s+', title_text, re.IGNORECASE)
@@ -131,27 +146,9 @@ class MonotaroScraper(ScraperBase):
                             break
             
             # ============ 価格取得 ============
-            price_tax_excluded = ''  # 税別価格
-            price_tax_included = ''  # 税込価格
-            
             # 方法1: 販売価格(税別)と販売価格(税込)を直接取得
-            # 税別価格: SellingPrice__Title の次の Price--Lg
-            selling_price_title = soup.select_one('.SellingPrice__Title')
-            if selling_price_title:
-                price_elem = selling_price_title.find_next('span', class_='Price--Lg')
-                if price_elem:
-                    price_text = price_elem.get_text(strip=True)
-                    numbers = re.findall(r'\d+', price_text.replace(',', ''))
-                    if numbers:
-                        price_tax_excluded = numbers[0]
-            
-            # 税込価格: 販売価格(税込)を含むReferencePrice
-            ref_price_title = soup.find('span', class_='ReferencePrice__Title', text=re.compile(r'販売価格.*税込'))
-            if ref_price_title and ref_price_title.parent:
-                parent_text = ref_price_title.parent.get_text(strip=True)
-                numbers = re.findall(r'[\d,]+', parent_text)
-                if numbers:
-                    price_tax_included = numbers[-1].replace(',', '')
+            price_tax_excluded = self._price_from_selling_price(ctx)   # 税別価格
+            price_tax_included = self._price_from_reference_price(ctx)  # 税込価格
             
             # 方法2: フォールバック - 複数の価格セレクタを試す（税込価格として扱う）
             if not price_tax_included and not price_tax_excluded:
@@ -178,7 +175,7 @@ class MonotaroScraper(ScraperBase):
             
             # 方法3: 価格が見つからない場合、テキスト内を直接探索
             if not price_tax_included and not price_tax_excluded:
-                page_text = soup.get_text()
+                page_text = ctx.raw_text
                 # 「¥xxx」パターンで検索
                 price_match = re.search(r'¥([\d,]+)', page_text)
                 if price_match:
@@ -198,16 +195,76 @@ class MonotaroScraper(ScraperBase):
                 except:
                     pass
             
-            return {
-                'supplier': 'モノタロウ',
-                'item_code': item_code or '',
-                'name': product_name,
-                'model': model_number or '',
-                'price_excl_tax': price_tax_excluded or '',
-                'price_incl_tax': price_tax_included or '',
-                'url': url
-            }
+            return self._make_record(url, item_code, product_name, model_number,
+                                     price_tax_excluded, price_tax_included)
         
         except Exception as e:
             print(f'エラー: {str(e)}, URL: {url}')
             return None
+    
+    def _make_record(self, url, item_code, product_name, model_number, price_tax_excluded, price_tax_included):
+        """返却用の辞書を作成"""
+        return {
+            'supplier': 'モノタロウ',
+            'item_code': item_code or '',
+            'name': product_name,
+            'model': model_number or '',
+            'price_excl_tax': price_tax_excluded or '',
+            'price_incl_tax': price_tax_included or '',
+            'url': url
+        }
+    
+    def _extract_primary(self, ctx: PageContext):
+        """
+        主要な方法（方法1）だけで (商品名, 型番, 税別価格, 税込価格) を取得
+        1つでも取れなければ None（全体を解析し直す）
+        """
+        fields = (
+            self._name_from_h1(ctx),
+            self._model_from_attr_labels(ctx),
+            self._price_from_selling_price(ctx),
+            self._price_from_reference_price(ctx),
+        )
+        if not all(fields):
+            return None
+        return fields
+    
+    def _name_from_h1(self, ctx: PageContext) -> str:
+        """h1タグから商品名を取得"""
+        h1_tag = ctx.soup.select_one('h1')
+        if h1_tag:
+            return h1_tag.get_text(strip=True)
+        return ''
+    
+    def _model_from_attr_labels(self, ctx: PageContext) -> str:
+        """span.AttributeLabelItem から型番を取得（品番M2.5×16 形式）"""
+        for attr_label in ctx.soup.select('span.AttributeLabelItem'):
+            text = attr_label.get_text(strip=True)
+            # "品番M2.5×16" から "M2.5×16" を抽出
+            if '品番' in text:
+                match = re.search(r'品番(.+)', text)
+                if match:
+                    return match.group(1).strip()
+        return ''
+    
+    def _price_from_selling_price(self, ctx: PageContext) -> str:
+        """税別価格: SellingPrice__Title の次の Price--Lg"""
+        selling_price_title = ctx.soup.select_one('.SellingPrice__Title')
+        if selling_price_title:
+            price_elem = selling_price_title.find_next('span', class_='Price--Lg')
+            if price_elem:
+                price_text = price_elem.get_text(strip=True)
+                numbers = re.findall(r'\d+', price_text.replace(',', ''))
+                if numbers:
+                    return numbers[0]
+        return ''
+    
+    def _price_from_reference_price(self, ctx: PageContext) -> str:
+        """税込価格: 販売価格(税込)を含むReferencePrice"""
+        ref_price_title = ctx.soup.find('span', class_='ReferencePrice__Title', string=re.compile(r'販売価格.*税込'))
+        if ref_price_title and ref_price_title.parent:
+            parent_text = ref_price_title.parent.get_text(strip=True)
+            numbers = re.findall(r'[\d,]+', parent_text)
+            if numbers:
+                return numbers[-1].replace(',', '')
+        return ''
@@ -0,0 +1,27 @@
+"""
+テスト共通設定
+FULL のモジュールを import できるようにし、キャッシュ等の保存先を一時ディレクトリに向ける
+"""
+import importlib.util
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['LOCALAPPDATA'] = tempfile.mkdtemp(prefix='unified_order_test_')
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def read_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURE_DIR, name), encoding='utf-8') as f:
+        return f.read()
+
+
+def load_standalone(relpath: str, name: str):
+    """単体版アプリ（2.Amazon/amazon.py など）をモジュールとして読み込む（FULL と同じ動きかを確かめる用）"""
+    spec = importlib.util.spec_from_file_location(name, os.path.join(REPO_DIR, relpath))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,70 @@
+"""
+サーキットブレーカーのテスト
+プロキシごとに分けたブレーカーが、他のプロキシ・直接接続を止めないことを確かめる
+単体版 Amazon アプリに写したブレーカーも同じ動きをするかを確かめる
+"""
+import pytest
+import circuit_breaker
+from circuit_breaker import HostBreakers, CircuitOpenError, OPEN, CLOSED, HALF_OPEN
+from conftest import load_standalone
+
+URL = 'https://www.amazon.co.jp/dp/B07XYZ1234'
+
+
+def test_block_on_one_proxy_does_not_stop_others():
+    breakers = HostBreakers()
+    breakers.configure('www.amazon.co.jp', threshold=2, cooldown=60.0)
+    for _ in range(2):
+        breakers.record_block(URL, 'http://proxy-a:8080')
+    
+    assert breakers.get(URL, 'http://proxy-a:8080').state == OPEN
+    assert breakers.get(URL, 'http://proxy-b:8080').state == CLOSED
+    assert breakers.get(URL).state == CLOSED
+    breakers.wait_ready(URL, 0.1, 'http://proxy-b:8080')
+    breakers.wait_ready(URL, 0.1)
+    with pytest.raises(CircuitOpenError):
+        breakers.wait_ready(URL, 0.1, 'http://proxy-a:8080')
+
+
+def test_unconfigured_host_is_not_limited():
+    breakers = HostBreakers()
+    assert breakers.get(URL, 'http://proxy-a:8080') is None
+    breakers.record_block(URL)
+    breakers.wait_ready(URL, 0.1)
+
+
+@pytest.fixture(params=['FULL', '2.Amazon'])
+def impl(request):
+    """FULL の circuit_breaker か、単体版 Amazon アプリ（HostBreakers・CircuitBreaker を写してある）"""
+    if request.param == 'FULL':
+        return circuit_breaker
+    return load_standalone('2.Amazon/amazon.py', 'standalone_amazon')
+
+
+def test_configure_keeps_existing_settings(impl):
+    breakers = impl.HostBreakers()
+    breakers.configure('www.amazon.co.jp', threshold=1, cooldown=60.0)
+    breakers.record_block(URL)
+    # 設定し直しても設定・停止状態は引き継ぐ
+    breakers.configure('www.amazon.co.jp', threshold=5, cooldown=1.0)
+    assert breakers.get(URL).state == OPEN
+    breakers.record_block(URL, 'http://proxy-a:8080')
+    assert breakers.get(URL, 'http://proxy-a:8080').state == OPEN
+
+
+def test_failed_probe_reopens_without_counting_a_trip(impl):
+    breaker = impl.CircuitBreaker(threshold=2, cooldown=0.01, max_cooldown=1.0)
+    breaker.record_block()
+    assert breaker.state == CLOSED
+    breaker.record_block()
+    assert (breaker.state, breaker.trips) == (OPEN, 1)
+    
+    assert breaker.wait_ready(1.0)
+    assert breaker.state == HALF_OPEN
+    breaker.record_block()
+    assert (breaker.state, breaker.trips) == (OPEN, 1)
+    assert breaker._current_cooldown == pytest.approx(0.02)
+    
+    assert breaker.wait_ready(1.0)
+    breaker.record_success()
+    assert (breaker.state, breaker.failures) == (CLOSED, 0)
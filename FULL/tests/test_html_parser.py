@@ -0,0 +1,208 @@
+"""
+HTMLパーサーの互換性テスト
+保存した商品ページを lxml と html.parser の両方で解析し、抽出結果が同じになることを確かめる。
+部分解析（slice_regions）の結果も全体を解析した結果と比べる
+"""
+import pytest
+import requests
+from conftest import read_fixture
+from html_parser import LXML_AVAILABLE, PARSER_ENV, make_soup, slice_regions, class_marker, id_marker
+from page_context import PageContext
+from scraper_monotaro import MonotaroScraper
+from scraper_akizuki import AkizukiScraper
+from scraper_amazon import AmazonScraper
+
+PARSERS = ['html.parser'] + (['lxml'] if LXML_AVAILABLE else [])
+
+MONOTARO_URL = 'https://www.monotaro.com/p/1234/5678/'
+AKIZUKI_URL = 'https://akizukidenshi.com/catalog/g/g108461/'
+AMAZON_URL = 'https://www.amazon.co.jp/dp/B07XYZ1234'
+
+# サイトごとに抽出結果を比べる要素
+SELECTORS = {
+    'monotaro.html': ['h1', 'span.AttributeLabelItem', '.SellingPrice__Title', 'span.Price--Lg',
+                      'span.ReferencePrice__Title', 'dt', 'dd', 'th', 'td'],
+    'akizuki.html': ['h1.h1-goods-name', 'dd#spec_number', 'dd#spec_goods', '.block-goods-price--price',
+                     '.block-goods-price--net-price', 'dt'],
+    'amazon.html': ['#productTitle', '#corePriceDisplay_desktop_feature_div .a-price .a-offscreen',
+                    'span.a-price .a-offscreen', '#productDetails_techSpec_section_1 tr',
+                    '#productDetails_detailBullets_sections1 tr'],
+}
+
+
+@pytest.fixture
+def parser(request, monkeypatch):
+    monkeypatch.setenv(PARSER_ENV, request.param)
+    return request.param
+
+
+def _fake_response(url: str, html: str) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response._content = html.encode('utf-8')
+    response.encoding = 'utf-8'
+    response.url = url
+    response.headers['Content-Type'] = 'text/html; charset=utf-8'
+    return response
+
+
+def _monotaro(html: str, partial: bool = True):
+    scraper = MonotaroScraper()
+    scraper._get_cached = lambda url, **kwargs: _fake_response(url, html)
+    if not partial:
+        scraper.parse_partial = lambda html: None
+    return scraper.fetch_product_data(MONOTARO_URL)
+
+
+def _akizuki(html: str, partial: bool = True):
+    scraper = AkizukiScraper()
+    scraper._fetch_page = lambda url, timeout=None: html
+    if not partial:
+        scraper.parse_partial = lambda html: None
+    return scraper.fetch_product_data(AKIZUKI_URL)
+
+
+def _amazon(html: str, partial: bool = True):
+    scraper = AmazonScraper()
+    try:
+        if not partial:
+            scraper.parse_partial = lambda html: None
+        return scraper._parse(html, AMAZON_URL)
+    finally:
+        scraper.close()
+
+
+EXTRACTORS = {
+    'monotaro.html': _monotaro,
+    'akizuki.html': _akizuki,
+    'amazon.html': _amazon,
+}
+
+EXPECTED = {
+    'monotaro.html': {
+        'item_code': '12345678', 'name': 'なべ小ねじ (+) 鉄/三価ホワイト\xa0M2.5×16', 'model': 'M2.5×16',
+        'price_excl_tax': '1280', 'price_incl_tax': '1408',
+    },
+    'akizuki.html': {
+        'item_code': '108461', 'name': 'ＵＳＢシリアル変換モジュール', 'model': 'AE-FT234X',
+        'price_excl_tax': 1000, 'price_incl_tax': 1100,
+    },
+    'amazon.html': {
+        'item_code': 'B07XYZ1234', 'name': 'エレコム USBケーブル Type-C 1.0m ブラック MPA-CC10NBK',
+        'model': 'MPA-CC10NBK', 'price_excl_tax': 1164, 'price_incl_tax': 1280,
+    },
+}
+
+
+def _selected_text(soup, selectors):
+    return {sel: [el.get_text(' ', strip=True) for el in soup.select(sel)] for sel in selectors}
+
+
+@pytest.mark.skipif(not LXML_AVAILABLE, reason='lxml がインストールされていない')
+@pytest.mark.parametrize('name', sorted(SELECTORS))
+def test_make_soup_same_tree_text(name):
+    html = read_fixture(name)
+    lxml_soup = make_soup(html, 'lxml')
+    std_soup = make_soup(html, 'html.parser')
+    assert _selected_text(lxml_soup, SELECTORS[name]) == _selected_text(std_soup, SELECTORS[name])
+    assert PageContext(lxml_soup).title == PageContext(std_soup).title
+    assert PageContext(lxml_soup).labels == PageContext(std_soup).labels
+
+
+@pytest.mark.parametrize('parser', PARSERS, indirect=True)
+@pytest.mark.parametrize('partial', [True, False], ids=['partial', 'full'])
+@pytest.mark.parametrize('name', sorted(EXTRACTORS))
+def test_extracted_fields(name, partial, parser):
+    record = EXTRACTORS[name](read_fixture(name), partial=partial)
+    assert record is not None
+    for key, value in EXPECTED[name].items():
+        assert record[key] == value, key
+
+
+@pytest.mark.parametrize('parser', PARSERS, indirect=True)
+@pytest.mark.parametrize('scraper_cls', [MonotaroScraper, AkizukiScraper, AmazonScraper])
+def test_slice_regions_matches_full_parse(scraper_cls, parser):
+    """部分解析で取れた要素は全体を解析したときと同じ内容になる"""
+    name = {MonotaroScraper: 'monotaro.html', AkizukiScraper: 'akizuki.html', AmazonScraper: 'amazon.html'}[scraper_cls]
+    html = read_fixture(name)
+    snippet = slice_regions(html, scraper_cls.parse_regions)
+    assert snippet is not None
+    partial_soup = make_soup(snippet)
+    full_soup = make_soup(html)
+    for sel in SELECTORS[name]:
+        partial_texts = [el.get_text(' ', strip=True) for el in partial_soup.select(sel)]
+        full_texts = [el.get_text(' ', strip=True) for el in full_soup.select(sel)]
+        # 切り出した領域にある要素は、全体の中にも同じ順で同じ内容で存在する
+        it = iter(full_texts)
+        assert all(text in it for text in partial_texts), sel
+
+
+def test_slice_regions_parent_and_nesting():
+    html = ('<div id="outer"><div class="box"><span class="t">A</span><div>inner</div></div>'
+            '<p>skip</p><div class="box"><span class="t">B</span></div></div>')
+    snippet = slice_regions(html, [(class_marker('box', 'div'), 0), (class_marker('t', 'span'), 0)])
+    soup = make_soup(snippet, 'html.parser')
+    # 入れ子になった span は外側の div に含まれるので重複しない
+    assert [el.get_text() for el in soup.select('span.t')] == ['A', 'B']
+    assert 'skip' not in snippet
+    
+    parent = slice_regions(html, [(class_marker('t', 'span'), 1)])
+    assert parent.count('inner') == 1
+    
+    assert slice_regions(html, [(id_marker('missing'), 0)]) is None
+
+
+def test_slice_regions_ignores_tags_in_scripts():
+    html = ('<script>var s = "<div class=\'box\'><span class=\'t\'>fake</span></div>";</script>'
+            '<!-- <div class="box">old</div> -->'
+            '<div id="wrap"><div class="box"><span class="t">real</span></div></div>')
+    snippet = slice_regions(html, [(class_marker('box', 'div'), 0), (class_marker('t', 'span'), 1)])
+    assert 'fake' not in snippet and 'old' not in snippet
+    soup = make_soup(snippet, 'html.parser')
+    assert [el.get_text() for el in soup.select('span.t')] == ['real']
+
+
+CAPTCHA_HTML = ('<html><head><title>Amazon.co.jp</title></head><body>'
+                '<form action="/errors/validateCaptcha"><h4>Type the characters you see in this image:</h4>'
+                '<img src="https://images-na.ssl-images-amazon.com/captcha/abc/Captcha_x.jpg"></form></body></html>')
+
+
+@pytest.mark.parametrize('html', [
+    CAPTCHA_HTML,
+    '<html><body><span id="productTitle">商品</span></body></html>',
+    '<html><body><div id="corePriceDisplay_desktop_feature_div"><span class="a-price">'
+    '<span class="a-offscreen">￥1,280</span></span></div></body></html>',
+], ids=['captcha', 'no-price', 'no-title'])
+def test_amazon_rejects_pages_without_name_and_price(html):
+    """ASINはURLから分かるが、商品名と価格がそろわないページ（ブロック画面など）は取得失敗にする"""
+    assert _amazon(html) is None
+    assert _amazon(html, partial=False) is None
+
+
+def test_amazon_strips_bidi_marks_in_detail_bullets():
+    html = ('<html><body><span id="productTitle">商品</span>'
+            '<span class="a-price"><span class="a-offscreen">￥500</span></span>'
+            '<div id="detailBullets_feature_div"><ul>'
+            '<li><span class="a-text-bold">メーカー型番 &rlm; : &lrm;</span><span>&lrm;AB-123</span></li>'
+            '<li><span class="a-text-bold">ASIN &rlm; : &lrm;</span><span>B07XYZ1234</span></li>'
+            '</ul></div></body></html>')
+    record = _amazon(html, partial=False)
+    assert record['model'] == 'AB-123'
+    assert record['item_code'] == 'B07XYZ1234'
+
+
+def test_amazon_incomplete_record_is_not_cached():
+    scraper = AmazonScraper()
+    try:
+        calls = []
+        incomplete = {'supplier': 'Amazon', 'item_code': 'B07XYZ1234', 'name': '', 'price_incl_tax': 0,
+                      'url': AMAZON_URL}
+        scraper.fetch_product_data = lambda url: calls.append(url) or dict(incomplete)
+        scraper.product_cache.put(scraper.get_site_name(), scraper.canonicalize_url(AMAZON_URL), 'B07XYZ1234',
+                                  dict(incomplete))
+        scraper.get_product(AMAZON_URL)
+        scraper.get_product(AMAZON_URL)
+        # キャッシュに残っていた欠けた情報も使わず、毎回取得し直す
+        assert len(calls) == 2
+    finally:
+        scraper.close()
@@ -0,0 +1,45 @@
+"""
+リクエスト間隔制御のテスト
+設定し直しても予約済みの待ち時間を引き継ぐこと、jitter で間隔が範囲内に散ることを確かめる
+単体版 Amazon アプリに写したトークンバケットも同じ動きをするかを確かめる
+"""
+import pytest
+import rate_limiter
+from conftest import load_standalone
+
+
+@pytest.fixture(params=['FULL', '2.Amazon'])
+def impl(request):
+    """FULL の rate_limiter か、単体版 Amazon アプリ（TokenBucket・HostScheduler を写してある）"""
+    if request.param == 'FULL':
+        return rate_limiter
+    return load_standalone('2.Amazon/amazon.py', 'standalone_amazon')
+
+
+def test_first_request_does_not_wait(impl):
+    bucket = impl.TokenBucket(rate=0.5, burst=1, jitter=2.0)
+    assert bucket.reserve() == 0.0
+
+
+def test_jitter_spreads_interval_between_min_and_max(impl):
+    bucket = impl.TokenBucket(rate=1.0, burst=1, jitter=2.0)
+    bucket.reserve()
+    previous = 0.0
+    for _ in range(50):
+        wait = bucket.reserve()
+        assert 1.0 - 0.05 <= wait - previous <= 3.0 + 0.05
+        previous = wait
+
+
+def test_configure_keeps_existing_reservations(impl):
+    scheduler = impl.HostScheduler()
+    scheduler.configure('example.com', rate=0.5)
+    bucket = scheduler._buckets['example.com']
+    bucket.reserve()
+    assert bucket.reserve() == pytest.approx(2.0, abs=0.05)
+    
+    # 設定し直してもバケットは作り直さず、前借り分を引き継いだままレートだけ変わる
+    scheduler.configure('example.com', rate=1.0)
+    assert scheduler._buckets['example.com'] is bucket
+    assert bucket.rate == 1.0
+    assert bucket.reserve() == pytest.approx(2.0, abs=0.05)  # 前借り1個 + 今回の1個を毎秒1個で返す
@@ -0,0 +1,26 @@
+"""
+文字コード判定のテスト
+判定方法ごとの回数が実行単位で数えられ、デバッグログに出ることを確かめる
+"""
+import logging
+import requests
+from text_encoding import resolve_encoding, get_encoding_stats, log_encoding_stats
+
+
+def _response(content: bytes, content_type: str) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response._content = content
+    response.url = 'https://stats.example.com/p/1'
+    response.headers['Content-Type'] = content_type
+    return response
+
+
+def test_log_encoding_stats_counts_this_run(caplog):
+    before = get_encoding_stats()
+    assert resolve_encoding(_response(b'<html></html>', 'text/html; charset=Shift_JIS')) == 'cp932'
+    assert resolve_encoding(_response(b'<meta charset="utf-8"><p>x</p>', 'text/html')) == 'utf-8'
+    with caplog.at_level(logging.DEBUG, logger='text_encoding'):
+        stats = log_encoding_stats(before)
+    assert stats == {'header': 1, 'meta': 1, 'learned': 0, 'detected': 0}
+    assert '文字コード判定の内訳' in caplog.text
@@ -0,0 +1,102 @@
+"""
+既存Excelへの追記のテスト
+openpyxl で作ったブックに append_rows で追記し、openpyxl で読み直して内容・書式・列幅を確かめる
+"""
+import os
+import re
+import zipfile
+import pytest
+from openpyxl import Workbook, load_workbook
+import xlsx_append
+from xlsx_append import WorkbookInfo, SheetNotFound, append_rows
+
+HEADERS = ['仕入元', '商品コード', '商品名', '単価']
+
+
+@pytest.fixture
+def book(tmp_path):
+    path = str(tmp_path / 'order.xlsx')
+    wb = Workbook()
+    ws = wb.active
+    ws.title = '注文内容'
+    ws.append(HEADERS)
+    ws.append(['モノタロウ', '00123', 'ボルト M3×10', 120])
+    ws.column_dimensions['C'].width = 30
+    wb.create_sheet('メモ')['A1'] = 'そのまま残す'
+    wb.save(path)
+    return path
+
+
+def test_workbook_info(book):
+    info = WorkbookInfo(book)
+    assert info.sheet_names == ['注文内容', 'メモ']
+    assert info.dimensions('注文内容') == (2, 4)
+    assert info.header('注文内容') == HEADERS
+    assert info.is_current()
+    with pytest.raises(SheetNotFound):
+        info.part('ない')
+
+
+def test_append_round_trip(book):
+    info = WorkbookInfo(book)
+    rows = [['Amazon', '0042', '長い商品名' * 10, 980], ['秋月電子', 'M-08461', 'A&B <テスト>', None]]
+    assert append_rows(book, '注文内容', rows, text_columns=(2,), autofit=(8, 50), info=info) == (3, 4)
+    
+    wb = load_workbook(book)
+    ws = wb['注文内容']
+    assert ws.max_row == 4
+    assert [c.value for c in ws[3]] == ['Amazon', '0042', '長い商品名' * 10, 980]
+    assert [c.value for c in ws[4]] == ['秋月電子', 'M-08461', 'A&B <テスト>', None]
+    assert ws['B3'].number_format == '@'
+    assert ws['A2'].value == 'モノタロウ'
+    # 追加した行に合わせて広がり、最大幅で止まる。手で広げた幅より狭い列は変えない
+    assert ws.column_dimensions['C'].width == 50
+    assert ws.column_dimensions['A'].width >= 10
+    assert wb['メモ']['A1'].value == 'そのまま残す'
+    
+    # 追記後の状態が info に反映され、続けて追記できる
+    assert info.is_current()
+    assert info.dimensions('注文内容') == (4, 4)
+    assert append_rows(book, '注文内容', [['Amazon', '0043', '次の行', 1]], info=info) == (5, 5)
+    assert load_workbook(book)['注文内容']['C5'].value == '次の行'
+
+
+def test_append_keeps_zip_valid(book):
+    append_rows(book, '注文内容', [['Amazon', '0042', '商品', 1]])
+    with zipfile.ZipFile(book) as zf:
+        assert zf.testzip() is None
+        assert len(zf.namelist()) == len(set(zf.namelist()))
+
+
+def test_append_to_missing_sheet(book):
+    with pytest.raises(SheetNotFound):
+        append_rows(book, '新しいシート', [['Amazon', '0042', '商品', 1]])
+    assert load_workbook(book).sheetnames == ['注文内容', 'メモ']
+
+
+def _drop_row_numbers(path, last_r):
+    """シートXMLの行から r 属性を外す（Excel以外のツールは r を省くことがある）"""
+    tmp = path + '.tmp'
+    with zipfile.ZipFile(path) as zin, zipfile.ZipFile(tmp, 'w', zipfile.ZIP_DEFLATED) as zout:
+        for member in zin.infolist():
+            data = zin.read(member)
+            if member.filename == 'xl/worksheets/sheet1.xml':
+                data = re.sub(rb'(<row\b[^>]*?) r="\d+"', rb'\1', data)
+                # 途中で r を明示した空行を足す（r のない行はその次の行になる）
+                data = data.replace(b'</sheetData>', b'<row r="%d"/><row/></sheetData>' % last_r)
+            zout.writestr(member, data)
+    os.replace(tmp, path)
+
+
+def test_rows_without_row_numbers(book, monkeypatch):
+    _drop_row_numbers(book, 5)
+    # 小さなチャンクで読んでも、境界をまたぐ行を二度数えない
+    monkeypatch.setattr(xlsx_append, 'CHUNK_SIZE', 64)
+    assert WorkbookInfo(book).dimensions('注文内容') == (6, 4)
+    monkeypatch.undo()
+    
+    info = WorkbookInfo(book)
+    assert info.dimensions('注文内容') == (6, 4)
+    assert info.header('注文内容') == HEADERS
+    assert append_rows(book, '注文内容', [['Amazon', '0042', '商品', 1]], info=info) == (7, 7)
+    assert load_workbook(book)['注文内容']['C7'].value == '商品'
@@ -0,0 +1,91 @@
+"""
+レスポンスの文字コード判定
+HTTPヘッダの charset → 先頭数KBの <meta charset> → ホストごとに覚えた文字コード の順に決め、
+どれも使えないときだけ本文全体の統計的判定（apparent_encoding）を行う
+"""
+from typing import Optional, Dict
+import codecs
+import logging
+import re
+import threading
+from urllib.parse import urlparse
+import requests
+
+# <meta charset> を探す範囲（バイト）
+META_SCAN_BYTES = 4096
+
+_HEADER_CHARSET_RE = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+_META_CHARSET_RE = re.compile(rb'<meta\b[^>]*?charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+
+# 日本語サイトで宣言どおりに読むと機種依存文字で失敗する文字コードは上位互換で読む
+_SUPERSETS = {'shift_jis': 'cp932'}
+
+_lock = threading.Lock()
+_learned: Dict[str, str] = {}
+_stats = {'header': 0, 'meta': 0, 'learned': 0, 'detected': 0}
+logger = logging.getLogger(__name__)
+
+
+def _normalize(name) -> Optional[str]:
+    """Pythonで使える文字コード名にそろえる（不明なら None）"""
+    if not name:
+        return None
+    if isinstance(name, bytes):
+        name = name.decode('ascii', 'ignore')
+    try:
+        name = codecs.lookup(name.strip()).name
+    except LookupError:
+        return None
+    return _SUPERSETS.get(name, name)
+
+
+def _count(path: str):
+    with _lock:
+        _stats[path] += 1
+
+
+def resolve_encoding(response: requests.Response) -> str:
+    """レスポンスの文字コードを決める"""
+    host = (urlparse(response.url or '').hostname or '').lower()
+    
+    m = _HEADER_CHARSET_RE.search(response.headers.get('Content-Type', ''))
+    encoding = _normalize(m.group(1)) if m else None
+    path = 'header'
+    
+    if encoding is None:
+        m = _META_CHARSET_RE.search(response.content[:META_SCAN_BYTES])
+        encoding = _normalize(m.group(1)) if m else None
+        path = 'meta'
+    
+    if encoding is None:
+        with _lock:
+            encoding = _learned.get(host)
+        path = 'learned'
+    
+    if encoding is None:
+        encoding = _normalize(response.apparent_encoding) or 'utf-8'
+        path = 'detected'
+    
+    _count(path)
+    if host and path != 'learned':
+        with _lock:
+            _learned[host] = encoding
+    return encoding
+
+
+def get_encoding_stats() -> Dict[str, int]:
+    """どの方法で文字コードを決めたかの回数"""
+    with _lock:
+        return dict(_stats)
+
+
+def log_encoding_stats(before: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    """
+    判定方法ごとの回数をデバッグログに出して返す
+    before に実行開始時の get_encoding_stats() を渡すと、その実行の分だけを数える
+    """
+    stats = get_encoding_stats()
+    if before:
+        stats = {path: count - before.get(path, 0) for path, count in stats.items()}
+    logger.debug('文字コード判定の内訳: %s', stats)
+    return stats
@@ -0,0 +1,86 @@
+"""
+HTTP通信層の設定
+接続プールのサイズ、接続/読み込みタイムアウト、TCPキープアライブ、
+接続エラーだけの通信レベルのリトライをまとめて設定したセッションを作る
+"""
+from typing import Optional, Dict
+import socket
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
+
+
+class TransportConfig:
+    """通信設定（サイトごとにスクレイパーのクラス属性で指定する）"""
+    
+    def __init__(self, pool_maxsize: int = 10, connect_timeout: float = 5.0, read_timeout: float = 20.0,
+                 retries: int = 2, backoff_factor: float = 0.5, keepalive: bool = True):
+        self.pool_maxsize = pool_maxsize          # 1ホストあたりの接続数
+        self.connect_timeout = connect_timeout    # 接続タイムアウト（秒）
+        self.read_timeout = read_timeout          # 読み込みタイムアウト（秒）
+        self.retries = retries                    # 通信レベルのリトライ回数（接続エラーのみ）
+        self.backoff_factor = backoff_factor
+        self.keepalive = keepalive                # TCPキープアライブ
+    
+    @property
+    def timeout(self):
+        """requests に渡す (接続, 読み込み) タイムアウト"""
+        return (self.connect_timeout, self.read_timeout)
+
+
+def _keepalive_socket_options():
+    """TCPキープアライブのソケットオプション（OSが対応しているものだけ）"""
+    options = list(HTTPConnection.default_socket_options)
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    for name, value in (('TCP_KEEPIDLE', 30), ('TCP_KEEPINTVL', 10), ('TCP_KEEPCNT', 3)):
+        if hasattr(socket, name):
+            options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+    return options
+
+
+class TunedHTTPAdapter(HTTPAdapter):
+    """ソケットオプションを指定できるHTTPAdapter"""
+    
+    def __init__(self, socket_options=None, **kwargs):
+        self.socket_options = socket_options
+        super().__init__(**kwargs)
+    
+    def init_poolmanager(self, *args, **kwargs):
+        if self.socket_options is not None:
+            kwargs['socket_options'] = self.socket_options
+        super().init_poolmanager(*args, **kwargs)
+    
+    def proxy_manager_for(self, *args, **kwargs):
+        if self.socket_options is not None:
+            kwargs['socket_options'] = self.socket_options
+        return super().proxy_manager_for(*args, **kwargs)
+
+
+def build_session(config: TransportConfig, headers: Optional[Dict[str, str]] = None) -> requests.Session:
+    """設定済みのセッションを作成"""
+    # 通信レベルで再送するのは接続エラーだけ（応答のステータスによる再試行は RetryPolicy に任せる。
+    # ここでも再送するとレート制限・サーキットブレーカーを通らずに1件で何回も送ってしまう）
+    retry = Retry(
+        total=config.retries,
+        connect=config.retries,
+        read=0,
+        status=0,
+        backoff_factor=config.backoff_factor,
+        status_forcelist=(),
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    )
+    adapter = TunedHTTPAdapter(
+        socket_options=_keepalive_socket_options() if config.keepalive else None,
+        pool_connections=4,
+        pool_maxsize=config.pool_maxsize,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    if headers:
+        session.headers.update(headers)
+    return session